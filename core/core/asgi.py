@@ -14,3 +14,11 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
 application = get_asgi_application()
+
+# Справочники загружаются до первого запроса, а не на горячем пути оформления заказа
+from django.db import connections  # noqa: E402
+from product.reference_cache import reference_cache  # noqa: E402
+
+reference_cache.warm()
+# Соединение, открытое для прогрева, не должно достаться воркерам после fork
+connections.close_all()
@@ -0,0 +1,27 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connection
+
+
+class BackgroundQueue:
+    """Фоновые задачи процесса, выполняемые по одной в отдельном потоке.
+
+    Ошибка задачи пишется в logger вызывающего модуля; соединение с БД,
+    которое поток открыл для задачи, закрывается после неё.
+    """
+
+    def __init__(self, name, logger):
+        self.name = name
+        self.logger = logger
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=name)
+
+    def submit(self, func, *args, error_message=None):
+        return self._executor.submit(self._run, func, args, error_message)
+
+    def _run(self, func, args, error_message):
+        try:
+            return func(*args)
+        except Exception:
+            self.logger.exception(error_message or f"Фоновая задача {self.name} завершилась с ошибкой")
+        finally:
+            connection.close()
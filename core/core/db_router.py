@@ -0,0 +1,97 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.permissions import SAFE_METHODS
+
+
+_replica_reads = ContextVar('replica_reads', default=False)
+
+PRIMARY_PIN_KEY = 'db:primary-pin:{}'
+
+
+def replica_aliases():
+    return [alias for alias in settings.DATABASES if alias.startswith('replica')]
+
+
+@contextmanager
+def replica_reads():
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def _pins():
+    # Отдельный общий кеш: запрос после записи может попасть в другой воркер
+    return caches['primary_pins']
+
+
+def pin_user_to_primary(user):
+    """После записи читаем данные пользователя с primary, пока реплика не догонит."""
+    if user.is_authenticated:
+        _pins().set(PRIMARY_PIN_KEY.format(user.pk), True, settings.REPLICA_STICKY_SECONDS)
+
+
+def is_pinned_to_primary(user):
+    return user.is_authenticated and _pins().get(PRIMARY_PIN_KEY.format(user.pk), False)
+
+
+class ReplicaRouter:
+    """Чтения внутри replica_reads() идут на реплики, всё остальное — на default."""
+
+    def __init__(self):
+        self.replicas = replica_aliases()
+
+    def db_for_read(self, model, **hints):
+        if self.replicas and _replica_reads.get():
+            return random.choice(self.replicas)
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {'default', *self.replicas}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None
+
+
+class ReplicaReadMixin:
+    """Для read-only представлений каталога: безопасные запросы читают с реплики.
+
+    Аутентификация выполняется до переключения, поэтому пользователь всегда
+    берётся с primary. Пользователь, недавно писавший в корзину или избранное,
+    продолжает читать с primary (read-your-writes).
+    """
+
+    _replica_token = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in SAFE_METHODS and not is_pinned_to_primary(request.user):
+            self._replica_token = _replica_reads.set(True)
+
+    def dispatch(self, request, *args, **kwargs):
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            if self._replica_token is not None:
+                _replica_reads.reset(self._replica_token)
+                self._replica_token = None
+
+
+class PrimaryStickyMixin:
+    """Успешная запись закрепляет пользователя за primary на REPLICA_STICKY_SECONDS."""
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            pin_user_to_primary(request.user)
+        return super().finalize_response(request, response, *args, **kwargs)
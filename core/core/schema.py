@@ -0,0 +1,43 @@
+import hashlib
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.views.decorators.http import condition, require_safe
+
+
+_loaded = {}
+
+
+def load_schema():
+    """Содержимое и ETag собранной схемы; файл перечитывается только после пересборки."""
+    path = settings.OPENAPI_SCHEMA_FILE
+    try:
+        mtime = path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+    cached = _loaded.get(path)
+    if cached is None or cached[0] != mtime:
+        content = path.read_bytes()
+        cached = (mtime, content, hashlib.sha256(content).hexdigest()[:16])
+        _loaded[path] = cached
+    return cached[1], cached[2]
+
+
+def schema_etag(request):
+    schema = load_schema()
+    return schema[1] if schema else None
+
+
+@require_safe
+@condition(etag_func=schema_etag)
+def precomputed_schema(request):
+    schema = load_schema()
+    if schema is None:
+        return HttpResponse(
+            "Схема OpenAPI не собрана: выполните manage.py build_openapi_schema",
+            status=503, content_type='text/plain; charset=utf-8',
+        )
+    response = HttpResponse(schema[0], content_type='application/vnd.oai.openapi; charset=utf-8')
+    # Клиент хранит схему и перепроверяет её по ETag, получая 304 без тела
+    response['Cache-Control'] = 'public, no-cache'
+    return response
@@ -13,22 +13,54 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 from datetime import timedelta
 from pathlib import Path
 import os
+import tempfile
+
+
+from django.core.exceptions import ImproperlyConfigured
 
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 
+def env_bool(name, default=False):
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def env_list(name, default=()):
+    value = os.environ.get(name)
+    if value is None:
+        return list(default)
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+# Профиль окружения: dev (локальная разработка), prod (боевой сервер), bench (нагрузочные замеры),
+# api (воркер только для REST API: настройки prod без админки и генерации схемы OpenAPI)
+PROFILES = ('dev', 'prod', 'bench', 'api')
+PROFILE = os.environ.get('DJANGO_PROFILE', 'dev')
+if PROFILE not in PROFILES:
+    raise ImproperlyConfigured(f"DJANGO_PROFILE должен быть одним из: {', '.join(PROFILES)}")
+
+
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
 
 # SECURITY WARNING: keep the secret key used in production secret!
-SECRET_KEY = 'django-insecure--b63ld@az@2!avzlro@zsa%92wy_pjq3%1wa!0++sae)@k_=a4'
+SECRET_KEY = os.environ.get(
+    'DJANGO_SECRET_KEY',
+    'django-insecure--b63ld@az@2!avzlro@zsa%92wy_pjq3%1wa!0++sae)@k_=a4'
+)
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = env_bool('DJANGO_DEBUG', PROFILE == 'dev')
 
-ALLOWED_HOSTS = []
+ALLOWED_HOSTS = env_list(
+    'DJANGO_ALLOWED_HOSTS',
+    ['localhost', '127.0.0.1'] if PROFILE == 'bench' else []
+)
 
 
 # Application definition
@@ -48,6 +80,13 @@ INSTALLED_APPS = [
     'user'
 ]
 
+# Воркер профиля api не загружает админку и drf_spectacular: быстрее холодный старт
+# при автомасштабировании. Админку и документацию обслуживают процессы профиля prod.
+API_ONLY = PROFILE == 'api'
+API_ONLY_EXCLUDED_APPS = ('django.contrib.admin', 'django.contrib.messages', 'drf_spectacular')
+if API_ONLY:
+    INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in API_ONLY_EXCLUDED_APPS]
+
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -57,6 +96,8 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
+if API_ONLY:
+    MIDDLEWARE.remove('django.contrib.messages.middleware.MessageMiddleware')
 
 ROOT_URLCONF = 'core.urls'
 
@@ -74,6 +115,8 @@ TEMPLATES = [
         },
     },
 ]
+if API_ONLY:
+    TEMPLATES[0]['OPTIONS']['context_processors'].remove('django.contrib.messages.context_processors.messages')
 
 WSGI_APPLICATION = 'core.wsgi.application'
 
@@ -81,13 +124,156 @@ WSGI_APPLICATION = 'core.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
+# DB_ENGINE=sqlite|postgres выбирает backend. В dev по умолчанию используется
+# обычный SQLite, в prod и bench включаются постоянные соединения и настройки
+# для конкурентной записи (WAL для SQLite, пул для PostgreSQL).
+
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite')
+DB_TUNED = env_bool('DB_TUNED', PROFILE != 'dev')
+DB_CONN_MAX_AGE = int(os.environ.get('DB_CONN_MAX_AGE', 600 if DB_TUNED else 0))
+
+
+def sqlite_database(name):
+    config = {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': name,
+        'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+        # Тестовая БД — файл, а не in-memory: общий кэш in-memory SQLite
+        # не даёт потокам писать параллельно, а тесты корзины это проверяют
+        'TEST': {'NAME': os.environ.get(
+            'DB_TEST_NAME', os.path.join(tempfile.gettempdir(), 'shop_test.sqlite3')
+        )},
+        'OPTIONS': {
+            # Сколько секунд ждать снятия блокировки вместо "database is locked"
+            'timeout': int(os.environ.get('DB_BUSY_TIMEOUT', 20)),
+            # Берём блокировку на запись в начале транзакции, чтобы ожидание
+            # работало через busy timeout, а не падало при повышении блокировки
+            'transaction_mode': 'IMMEDIATE',
+        },
+    }
+    if DB_TUNED:
+        config['OPTIONS']['init_command'] = (
+            'PRAGMA journal_mode=WAL;'
+            'PRAGMA synchronous=NORMAL;'
+            'PRAGMA cache_size=-20000;'
+        )
+    return config
+
+
+def postgres_database(name, host):
+    config = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': name,
+        'USER': os.environ.get('DB_USER', 'postgres'),
+        'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+        'HOST': host,
+        'PORT': os.environ.get('DB_PORT', '5432'),
+        'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': DB_CONN_MAX_AGE > 0,
+        'OPTIONS': {},
+    }
+    if DB_TUNED and env_bool('DB_POOL', True):
+        # Пул psycopg (psycopg[pool]) несовместим с CONN_MAX_AGE > 0:
+        # соединения переиспользует сам пул
+        config['CONN_MAX_AGE'] = 0
+        config['CONN_HEALTH_CHECKS'] = False
+        config['OPTIONS']['pool'] = {
+            'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+            'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', 20)),
+            'timeout': int(os.environ.get('DB_POOL_TIMEOUT', 10)),
+        }
+    return config
+
+
+if DB_ENGINE == 'sqlite':
+    DATABASES = {
+        'default': sqlite_database(os.environ.get('DB_NAME', BASE_DIR / 'db.sqlite3')),
     }
+elif DB_ENGINE == 'postgres':
+    DATABASES = {
+        'default': postgres_database(
+            os.environ.get('DB_NAME', 'shop'),
+            os.environ.get('DB_HOST', 'localhost'),
+        ),
+    }
+else:
+    raise ImproperlyConfigured("DB_ENGINE должен быть sqlite или postgres")
+
+# Реплики для чтения каталога: пути к файлам SQLite или хосты PostgreSQL через запятую.
+# В тестах реплики зеркалируют default.
+for index, replica in enumerate(env_list('DB_REPLICAS'), start=1):
+    if DB_ENGINE == 'sqlite':
+        DATABASES[f'replica{index}'] = sqlite_database(replica)
+    else:
+        DATABASES[f'replica{index}'] = postgres_database(DATABASES['default']['NAME'], replica)
+    DATABASES[f'replica{index}']['TEST'] = {'MIRROR': 'default'}
+
+DATABASE_ROUTERS = ['core.db_router.ReplicaRouter']
+
+# Сколько секунд после записи в корзину/избранное пользователь читает только с primary
+REPLICA_STICKY_SECONDS = int(os.environ.get('DB_REPLICA_STICKY_SECONDS', 10))
+
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Гостевые корзины; в проде можно указать общий Redis через GUEST_CART_CACHE_URL
+    'guest_carts': {
+        'BACKEND': (
+            'django.core.cache.backends.redis.RedisCache'
+            if os.environ.get('GUEST_CART_CACHE_URL')
+            else 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.environ.get('GUEST_CART_CACHE_URL', 'guest-carts'),
+    },
+    # Корзины токенов для ограничения запросов; общий Redis через THROTTLE_CACHE_URL
+    # делает лимиты общими для всех процессов, LocMem — лимиты на процесс
+    'throttle': {
+        'BACKEND': (
+            'django.core.cache.backends.redis.RedisCache'
+            if os.environ.get('THROTTLE_CACHE_URL')
+            else 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.environ.get('THROTTLE_CACHE_URL', 'throttle'),
+    },
+    # Закрепление пользователей за primary после записи; чтобы закрепление
+    # видели все воркеры, в проде указывается общий Redis через PRIMARY_PIN_CACHE_URL
+    'primary_pins': {
+        'BACKEND': (
+            'django.core.cache.backends.redis.RedisCache'
+            if os.environ.get('PRIMARY_PIN_CACHE_URL')
+            else 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.environ.get('PRIMARY_PIN_CACHE_URL', 'primary-pins'),
+    },
+    # Множества id избранных товаров; с общим Redis через FAVORITE_CACHE_URL
+    # сброс после изменения избранного виден всем воркерам
+    'favorites': {
+        'BACKEND': (
+            'django.core.cache.backends.redis.RedisCache'
+            if os.environ.get('FAVORITE_CACHE_URL')
+            else 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.environ.get('FAVORITE_CACHE_URL', 'favorites'),
+    },
 }
 
+# Общий остаток товара, ниже которого отправляется событие low_stock
+LOW_STOCK_THRESHOLD = int(os.environ.get('LOW_STOCK_THRESHOLD', 5))
+
+# Время жизни гостевой корзины с момента последнего изменения, в секундах
+GUEST_CART_TTL = int(os.environ.get('GUEST_CART_TTL', 60 * 60 * 24 * 7))
+
+# Справочники (QR-коды оплаты, размеры, категории) кешируются в памяти процесса.
+# Сигналы сбрасывают кеш только в процессе, где произошло изменение, поэтому
+# TTL ограничивает время, в течение которого другие воркеры видят старые данные.
+REFERENCE_CACHE_TTL = int(os.environ.get('REFERENCE_CACHE_TTL', 300))
+
+# Сколько секунд хранится множество id избранных товаров пользователя. Без общего
+# FAVORITE_CACHE_URL другие воркеры видят старое множество не дольше этого времени.
+FAVORITE_IDS_CACHE_TTL = int(os.environ.get('FAVORITE_IDS_CACHE_TTL', 60))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -108,6 +294,31 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Хеширование паролей: PASSWORD_HASHER выбирает алгоритм для новых паролей
+# (argon2 требует argon2-cffi, bcrypt — пакет bcrypt). Остальные алгоритмы
+# остаются в списке только для проверки уже сохранённых хешей; такой хеш
+# перехешируется выбранным алгоритмом после успешного входа.
+PASSWORD_HASHER_CLASSES = {
+    'pbkdf2': 'user.hashers.TunablePBKDF2PasswordHasher',
+    'argon2': 'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'scrypt': 'django.contrib.auth.hashers.ScryptPasswordHasher',
+    'bcrypt': 'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+}
+PASSWORD_HASHER = os.environ.get('PASSWORD_HASHER', 'pbkdf2')
+if PASSWORD_HASHER not in PASSWORD_HASHER_CLASSES:
+    raise ImproperlyConfigured(f"PASSWORD_HASHER должен быть одним из: {', '.join(PASSWORD_HASHER_CLASSES)}")
+PASSWORD_HASHERS = [PASSWORD_HASHER_CLASSES[PASSWORD_HASHER]] + [
+    hasher for name, hasher in PASSWORD_HASHER_CLASSES.items() if name != PASSWORD_HASHER
+] + ['django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher']
+
+# Число итераций PBKDF2; 0 — значение по умолчанию текущей версии Django
+PASSWORD_PBKDF2_ITERATIONS = int(os.environ.get('PASSWORD_PBKDF2_ITERATIONS', 0))
+
+# Перехеширование устаревших хешей при входе выполняется в фоновом потоке,
+# чтобы не увеличивать время ответа на выдачу токена
+PASSWORD_REHASH_IN_BACKGROUND = env_bool('PASSWORD_REHASH_IN_BACKGROUND', True)
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 
@@ -130,6 +341,11 @@ STATICFILES_DIRS = [
     BASE_DIR.parent / 'static',  # Путь от settings.py до static
 ]
 
+# Схема OpenAPI: в dev drf_spectacular строит её на каждый запрос, в остальных профилях
+# отдаётся файл, собранный при деплое командой build_openapi_schema
+OPENAPI_LIVE_SCHEMA = env_bool('OPENAPI_LIVE_SCHEMA', PROFILE == 'dev')
+OPENAPI_SCHEMA_FILE = Path(os.environ.get('OPENAPI_SCHEMA_FILE', BASE_DIR.parent / 'static' / 'openapi' / 'schema.yaml'))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -145,15 +361,44 @@ SIMPLE_JWT = {
     'ALGORITHM': 'HS256',  # Алгоритм подписи токенов
     'AUTH_HEADER_TYPES': ('Bearer',),  # Тип HTTP заголовка, содержащего токен
     'AUTH_TOKEN_CLASSES': ('rest_framework_simplejwt.tokens.AccessToken',),
+    'TOKEN_REFRESH_SERIALIZER': 'user.serializers.RevocableTokenRefreshSerializer',
 }
 
+# Как часто процесс подгружает отозванные другими процессами refresh-токены, в секундах
+TOKEN_REVOCATION_SYNC_SECONDS = int(os.environ.get('TOKEN_REVOCATION_SYNC_SECONDS', 5))
+# Как часто удаляются записи об истёкших refresh-токенах, в секундах; 0 — не удалять автоматически
+TOKEN_PRUNE_INTERVAL = int(os.environ.get('TOKEN_PRUNE_INTERVAL', 60 * 60))
+
+# Удалённые аккаунты стираются фоновым потоком пачками по ACCOUNT_PURGE_BATCH_SIZE строк;
+# незавершённые удаления дочищает команда purge_deleted_accounts
+ACCOUNT_PURGE_IN_BACKGROUND = env_bool('ACCOUNT_PURGE_IN_BACKGROUND', True)
+ACCOUNT_PURGE_BATCH_SIZE = int(os.environ.get('ACCOUNT_PURGE_BATCH_SIZE', 500))
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ],
     'DATETIME_FORMAT': '%Y-%m-%d %H:%M:%S',
-    'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    'DEFAULT_THROTTLE_CLASSES': [
+        'core.throttling.UserTokenBucketThrottle',
+        'core.throttling.AnonTokenBucketThrottle',
+        'core.throttling.ScopedTokenBucketThrottle',
+    ],
+    # Ёмкость корзины / период её полного пополнения
+    'DEFAULT_THROTTLE_RATES': {
+        'user': os.environ.get('THROTTLE_RATE_USER', '600/min'),
+        'anon': os.environ.get('THROTTLE_RATE_ANON', '120/min'),
+        'password_reset': os.environ.get('THROTTLE_RATE_PASSWORD_RESET', '5/hour'),
+        'order_create': os.environ.get('THROTTLE_RATE_ORDER_CREATE', '30/hour'),
+        'popular_products': os.environ.get('THROTTLE_RATE_POPULAR_PRODUCTS', '60/min'),
+    },
+    # Число доверенных прокси перед приложением. При 0 IP клиента берётся из
+    # REMOTE_ADDR, иначе — из X-Forwarded-For на этой глубине; сам заголовок
+    # клиент подделывает, поэтому без прокси он не учитывается
+    'NUM_PROXIES': int(os.environ.get('THROTTLE_NUM_PROXIES', 0)),
 }
+if not API_ONLY:
+    REST_FRAMEWORK['DEFAULT_SCHEMA_CLASS'] = 'drf_spectacular.openapi.AutoSchema'
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
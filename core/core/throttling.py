@@ -0,0 +1,188 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.redis import RedisCache
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 60 * 60 * 24}
+
+# Пополнение и списание за один вызов на стороне Redis; время берётся из Redis,
+# чтобы расхождение часов между серверами приложения не влияло на скорость пополнения.
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local ttl = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], ttl)
+return {allowed, tostring(tokens)}
+"""
+
+
+def parse_rate(rate):
+    """'5/hour' -> (5, 3600): ёмкость корзины и период, за который она наполняется полностью."""
+    num, period = rate.split('/')
+    return int(num), PERIODS[period[0]]
+
+
+class TokenBucketStore:
+    """Корзины токенов в кеше THROTTLE_CACHE: одна запись (tokens, ts) на ключ.
+
+    Для Redis списание выполняет Lua-скрипт — атомарно для всех процессов.
+    Для локального кеша (LocMem живёт в памяти процесса) атомарность
+    обеспечивает блокировка процесса.
+    """
+
+    def __init__(self, alias):
+        self.alias = alias
+        self._lock = threading.Lock()
+        self._script = None
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def consume(self, key, capacity, period):
+        """Списывает токен; возвращает (разрешено, сколько секунд ждать следующего токена)."""
+        rate = capacity / period
+        if isinstance(self.cache, RedisCache):
+            allowed, tokens = self._consume_redis(key, capacity, rate, period)
+        else:
+            allowed, tokens = self._consume_local(key, capacity, rate, period)
+        return allowed, 0 if allowed else (1 - tokens) / rate
+
+    def _consume_redis(self, key, capacity, rate, period):
+        client = self.cache._cache.get_client(key, write=True)
+        if self._script is None:
+            self._script = client.register_script(TOKEN_BUCKET_SCRIPT)
+        allowed, tokens = self._script(keys=[self.cache.make_key(key)], args=[capacity, rate, period], client=client)
+        return bool(allowed), float(tokens)
+
+    def _consume_local(self, key, capacity, rate, period):
+        with self._lock:
+            now = time.monotonic()
+            tokens, ts = self.cache.get(key) or (capacity, now)
+            tokens = min(capacity, tokens + max(0, now - ts) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self.cache.set(key, (tokens, now), period)
+        return allowed, tokens
+
+    def record(self, scope, allowed):
+        key = f"throttle-metrics:{scope}:{'allowed' if allowed else 'throttled'}"
+        cache = self.cache
+        cache.add(key, 0, None)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Запись могла быть вытеснена между add и incr
+            cache.set(key, 1, None)
+
+    def metrics(self, scopes):
+        keys = {
+            f"throttle-metrics:{scope}:{outcome}": (scope, outcome)
+            for scope in scopes for outcome in ('allowed', 'throttled')
+        }
+        values = self.cache.get_many(keys)
+        result = {scope: {'allowed': 0, 'throttled': 0} for scope in scopes}
+        for key, value in values.items():
+            scope, outcome = keys[key]
+            result[scope][outcome] = value
+        return result
+
+
+store = TokenBucketStore('throttle')
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Ограничение по корзине токенов: ёмкость и скорость пополнения задаются
+    ставкой из REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'] для self.scope.
+
+    Подклассы определяют scope и get_cache_key; None — запрос не ограничивается.
+    """
+
+    scope = None
+
+    def __init__(self):
+        self._wait = None
+
+    def get_scope(self, request, view):
+        return self.scope
+
+    def get_cache_key(self, request, view):
+        raise NotImplementedError('.get_cache_key() must be overridden')
+
+    def client_key(self, request):
+        if request.user and request.user.is_authenticated:
+            return f"user:{request.user.pk}"
+        return f"ip:{self.get_ident(request)}"
+
+    def allow_request(self, request, view):
+        scope = self.get_scope(request, view)
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(scope) if scope else None
+        if rate is None:
+            return True
+        ident = self.get_cache_key(request, view)
+        if ident is None:
+            return True
+
+        capacity, period = parse_rate(rate)
+        allowed, self._wait = store.consume(f"throttle:{scope}:{ident}", capacity, period)
+        store.record(scope, allowed)
+        return allowed
+
+    def wait(self):
+        return self._wait
+
+
+class UserTokenBucketThrottle(TokenBucketThrottle):
+    """Общий лимит запросов аутентифицированного пользователя."""
+    scope = 'user'
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return f"user:{request.user.pk}"
+        return None
+
+
+class AnonTokenBucketThrottle(TokenBucketThrottle):
+    """Общий лимит анонимных запросов с одного IP."""
+    scope = 'anon'
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return None
+        return f"ip:{self.get_ident(request)}"
+
+
+class ScopedTokenBucketThrottle(TokenBucketThrottle):
+    """Отдельный лимит для дорогих операций: scope берётся из view.throttle_scope,
+    ключ — пользователь, а для анонимных запросов — IP."""
+
+    def get_scope(self, request, view):
+        return getattr(view, 'throttle_scope', None)
+
+    def get_cache_key(self, request, view):
+        return self.client_key(request)
+
+
+def throttle_metrics():
+    return {
+        'store': settings.CACHES['throttle']['BACKEND'].rsplit('.', 1)[-1],
+        'scopes': store.metrics(list(api_settings.DEFAULT_THROTTLE_RATES)),
+    }
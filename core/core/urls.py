@@ -14,24 +14,37 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
-from drf_spectacular.views import SpectacularAPIView, SpectacularRedocView, SpectacularSwaggerView
+from .views import ThrottleStatsView
 
 
 urlpatterns = [
-    path('admin/', admin.site.urls),
     path('api/', include([
         path('products/', include('product.urls')),
         path('user/', include('user.urls')),
+        path('throttle-stats/', ThrottleStatsView.as_view(), name='throttle_stats'),
     ])),
-    path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
-    path('api/docs/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
-    path('api/redoc/', SpectacularRedocView.as_view(url_name='schema'), name='redoc'),
 ] + static(settings.STATIC_URL, document_root=settings.STATIC_ROOT) + static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
 
 
+# Воркеры профиля api не импортируют админку и drf_spectacular
+if not settings.API_ONLY:
+    from django.contrib import admin
+    from drf_spectacular.views import SpectacularAPIView, SpectacularRedocView, SpectacularSwaggerView
+    from .schema import precomputed_schema
+
+    urlpatterns += [
+        path('admin/', admin.site.urls),
+        path(
+            'api/schema/',
+            SpectacularAPIView.as_view() if settings.OPENAPI_LIVE_SCHEMA else precomputed_schema,
+            name='schema',
+        ),
+        path('api/docs/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
+        path('api/redoc/', SpectacularRedocView.as_view(url_name='schema'), name='redoc'),
+    ]
+
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
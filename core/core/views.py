@@ -0,0 +1,11 @@
+from rest_framework.permissions import IsAdminUser
+from rest_framework.views import APIView, Response
+
+from .throttling import throttle_metrics
+
+
+class ThrottleStatsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(throttle_metrics())
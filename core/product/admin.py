@@ -1,11 +1,26 @@
+import io
+from datetime import timedelta
+
+from django import forms
+from django.conf import settings
 from django.contrib import admin
+from django.core.exceptions import PermissionDenied
+from django.http import StreamingHttpResponse
+from django.shortcuts import render
+from django.utils import timezone
+from django.urls import path
 from django.utils.html import format_html
-from django.db.models import Count, Sum
+from django.db.models import Count, Sum, Prefetch
 from .choices import OrderStatusEnum
+from .admin_utils import AutocompleteFilterMixin, EstimatedCountPaginator, autocomplete_filter
+from .inventory_io import FORMATS, read_rows, iter_lines, import_inventory
+from . import order_export
+from .order_status import InvalidStatusTransition, can_transition, change_order_status
 from .models import (
     Product, Banner, Brand, Category, Size, Image,
     Cart, CartItem, Favorite, ProductSizeInventory,
-    Order, OrderItem, PaymentQR
+    Order, OrderItem, OrderStatusEvent, PaymentQR,
+    DailySales, DailyProductSales, StockSnapshot
 )
 
 class OrderItemInline(admin.TabularInline):
@@ -14,14 +29,44 @@ class OrderItemInline(admin.TabularInline):
     readonly_fields = ('product', 'size', 'quantity', 'price')
 
 
+class OrderStatusEventInline(admin.TabularInline):
+    model = OrderStatusEvent
+    extra = 0
+    fields = ('from_status', 'to_status', 'user', 'created_at')
+    readonly_fields = fields
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('user')
+
+
+class OrderAdminForm(forms.ModelForm):
+    class Meta:
+        model = Order
+        fields = '__all__'
+
+    def clean_status(self):
+        status = self.cleaned_data['status']
+        previous = getattr(self.instance, '_original_status', None)
+        if previous and not can_transition(previous, status):
+            raise forms.ValidationError(str(InvalidStatusTransition(previous, status)))
+        return status
+
+
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
+    form = OrderAdminForm
     list_display = ('id', 'user', 'total', 'status', 'receipt_preview', 'created_at')
     list_filter = ('status', 'created_at')
     search_fields = ('user__username', 'id')
     readonly_fields = ('total', 'created_at', 'updated_at', 'receipt_preview')
-    inlines = [OrderItemInline]
-    actions = ['mark_accepted', 'mark_rejected']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    inlines = [OrderItemInline, OrderStatusEventInline]
+    actions = ['mark_accepted', 'mark_rejected', 'export_csv']
 
     def receipt_preview(self, obj):
         if obj.receipt:
@@ -30,15 +75,17 @@ class OrderAdmin(admin.ModelAdmin):
 
     receipt_preview.short_description = 'Чек'
 
-    def mark_accepted(self, request, queryset):
+    def save_model(self, request, obj, form, change):
+        obj._status_changed_by = request.user
+        super().save_model(request, obj, form, change)
+
+    def change_status(self, request, queryset, status):
         success_count = 0
         error_count = 0
 
         for order in queryset:
             try:
-                if order.status != OrderStatusEnum.ACCEPTED:
-                    order.status = OrderStatusEnum.ACCEPTED
-                    order.save()
+                if change_order_status(order, status, user=request.user):
                     success_count += 1
             except Exception as e:
                 error_count += 1
@@ -46,25 +93,36 @@ class OrderAdmin(admin.ModelAdmin):
                     request, f"Ошибка при обработке заказа {order.id}: {str(e)}",
                     level='ERROR'
                 )
-
-        if success_count:
-            self.message_user(
-                request, f"Успешно принято {success_count} заказов",
-                level='SUCCESS'
-            )
         if error_count:
             self.message_user(
                 request, f"Не удалось обработать {error_count} заказов",
                 level='ERROR'
             )
+        return success_count
 
+    def mark_accepted(self, request, queryset):
+        success_count = self.change_status(request, queryset, OrderStatusEnum.ACCEPTED)
+        if success_count:
+            self.message_user(
+                request, f"Успешно принято {success_count} заказов",
+                level='SUCCESS'
+            )
 
     def mark_rejected(self, request, queryset):
-        queryset.update(status=OrderStatusEnum.REJECTED)
-        self.message_user(request, f"Успешно отклонено {queryset.count()} заказов.", level='SUCCESS')
+        success_count = self.change_status(request, queryset, OrderStatusEnum.REJECTED)
+        if success_count:
+            self.message_user(request, f"Успешно отклонено {success_count} заказов.", level='SUCCESS')
 
     mark_rejected.short_description = "Пометить как отклонено"
 
+    def export_csv(self, request, queryset):
+        lines = order_export.iter_lines(order_export.order_lines(orders=queryset.order_by().values('pk')), 'csv')
+        response = StreamingHttpResponse(lines, content_type='text/csv')
+        response['Content-Disposition'] = 'attachment; filename="orders.csv"'
+        return response
+
+    export_csv.short_description = "Выгрузить позиции в CSV"
+
 
 @admin.register(PaymentQR)
 class PaymentQRAdmin(admin.ModelAdmin):
@@ -103,17 +161,17 @@ class ProductAdmin(admin.ModelAdmin):
     list_display = ('name', 'category', 'price', 'final_price', 'discount_percent',
                     'status', 'is_active', 'main_image_preview', 'inventory_status')
     list_filter = ('category', 'status', 'is_active', 'discount_percent')
-    search_fields = ('name', 'description')
-    readonly_fields = ('final_price', 'main_image_preview', 'created_at', 'updated_at')
+    search_fields = ('name', 'sku', 'description')
+    readonly_fields = ('final_price', 'main_image_preview', 'total_stock', 'created_at', 'updated_at')
     fieldsets = (
         ('Основная информация', {
-            'fields': ('name', 'category', 'description', 'main_cover', 'main_image_preview')
+            'fields': ('name', 'sku', 'category', 'description', 'main_cover', 'main_image_preview')
         }),
         ('Цены', {
             'fields': ('price', 'discount_percent', 'final_price'),
         }),
         ('Статус', {
-            'fields': ('status', 'is_active'),
+            'fields': ('status', 'is_active', 'total_stock'),
         }),
         ('Системная информация', {
             'fields': ('created_at', 'updated_at'),
@@ -131,7 +189,7 @@ class ProductAdmin(admin.ModelAdmin):
     main_image_preview.short_description = 'Фото'
 
     def inventory_status(self, obj):
-        total_stock = ProductSizeInventory.objects.filter(product=obj).aggregate(Sum('stock'))['stock__sum'] or 0
+        total_stock = obj.total_stock
         if total_stock <= 0:
             return format_html('<span style="color: red;">Нет в наличии</span>')
         elif total_stock < 5:
@@ -139,6 +197,7 @@ class ProductAdmin(admin.ModelAdmin):
         else:
             return format_html('<span style="color: green;">В наличии ({} шт.)</span>', total_stock)
     inventory_status.short_description = 'Наличие'
+    inventory_status.admin_order_field = 'total_stock'
 
 
 @admin.register(Category)
@@ -148,8 +207,9 @@ class CategoryAdmin(admin.ModelAdmin):
     readonly_fields = ('created_at', 'updated_at')
 
     def product_count(self, obj):
-        return obj.products.count()
+        return obj.product_count
     product_count.short_description = 'Количество товаров'
+    product_count.admin_order_field = 'product_count'
 
     def get_queryset(self, request):
         queryset = super().get_queryset(request)
@@ -208,10 +268,19 @@ class CartAdmin(admin.ModelAdmin):
     list_display = ('user', 'items_count', 'total_value', 'created_at')
     search_fields = ('user__username', 'user__email')
     readonly_fields = ('created_at', 'updated_at')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request).select_related('user')
+        return queryset.annotate(items_total=Count('items')).prefetch_related(
+            Prefetch('items', queryset=CartItem.objects.select_related('product'))
+        )
 
     def items_count(self, obj):
-        return obj.items.count()
+        return obj.items_total
     items_count.short_description = 'Количество товаров'
+    items_count.admin_order_field = 'items_total'
 
     def total_value(self, obj):
         total = 0
@@ -228,9 +297,16 @@ class CartItemInline(admin.TabularInline):
 
 
 @admin.register(CartItem)
-class CartItemAdmin(admin.ModelAdmin):
+class CartItemAdmin(AutocompleteFilterMixin, admin.ModelAdmin):
     list_display = ('cart', 'product', 'size', 'quantity')
-    list_filter = ('cart', 'product', 'size')
+    list_select_related = ('cart__user', 'product', 'size')
+    list_filter = (
+        autocomplete_filter('cart', 'Корзина'),
+        autocomplete_filter('product', 'Товар'),
+        'size',
+    )
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     search_fields = ('product__name', 'cart__user__username')
     autocomplete_fields = ['product', 'size', 'cart']
 
@@ -243,13 +319,95 @@ class FavoriteAdmin(admin.ModelAdmin):
     autocomplete_fields = ['user', 'product']
 
 
+class StockLevelFilter(admin.SimpleListFilter):
+    title = 'Наличие'
+    parameter_name = 'stock_level'
+
+    def lookups(self, request, model_admin):
+        return (
+            ('out', 'Нет в наличии'),
+            ('low', 'Мало'),
+            ('in', 'В наличии'),
+        )
+
+    def queryset(self, request, queryset):
+        if self.value() == 'out':
+            return queryset.filter(stock=0)
+        if self.value() == 'low':
+            return queryset.filter(stock__gt=0, stock__lt=5)
+        if self.value() == 'in':
+            return queryset.filter(stock__gte=5)
+        return queryset
+
+
+class InventoryImportForm(forms.Form):
+    file = forms.FileField(label='Файл')
+    format = forms.ChoiceField(label='Формат', choices=[(fmt, fmt.upper()) for fmt in FORMATS])
+    dry_run = forms.BooleanField(label='Только проверить, без записи', required=False)
+
+
 @admin.register(ProductSizeInventory)
-class ProductSizeInventoryAdmin(admin.ModelAdmin):
+class ProductSizeInventoryAdmin(AutocompleteFilterMixin, admin.ModelAdmin):
     list_display = ('product', 'size', 'stock', 'stock_status')
-    list_filter = ('product', 'size', 'stock')
+    list_filter = (autocomplete_filter('product', 'Товар'), 'size', StockLevelFilter)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     search_fields = ('product__name', 'size__name')
     list_editable = ('stock',)
     autocomplete_fields = ['product', 'size']
+    change_list_template = 'admin/product/productsizeinventory/change_list.html'
+
+    def get_urls(self):
+        urls = [
+            path('import/', self.admin_site.admin_view(self.import_view), name='product_inventory_import'),
+            path('export/', self.admin_site.admin_view(self.export_view), name='product_inventory_export'),
+        ]
+        return urls + super().get_urls()
+
+    def import_view(self, request):
+        if not self.has_change_permission(request):
+            raise PermissionDenied
+        report = None
+        changes = []
+        form = InventoryImportForm(request.POST or None, request.FILES or None)
+        if request.method == 'POST' and form.is_valid():
+            stream = io.TextIOWrapper(form.cleaned_data['file'].file, encoding='utf-8-sig', newline='')
+
+            def on_change(product_id, size_name, old_stock, new_stock):
+                if len(changes) < 200:
+                    changes.append((product_id, size_name, old_stock, new_stock))
+
+            try:
+                report = import_inventory(
+                    read_rows(stream, form.cleaned_data['format']),
+                    dry_run=form.cleaned_data['dry_run'],
+                    on_change=on_change,
+                )
+            except (ValueError, UnicodeDecodeError) as e:
+                self.message_user(request, f"Не удалось прочитать файл: {e}", level='ERROR')
+            else:
+                self.message_user(request, f"Импорт остатков: {report}", level='SUCCESS')
+
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Импорт остатков',
+            'form': form,
+            'report': report,
+            'changes': changes,
+        }
+        return render(request, 'admin/product/productsizeinventory/import.html', context)
+
+    def export_view(self, request):
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        fmt = request.GET.get('format', 'csv')
+        if fmt not in FORMATS:
+            fmt = 'csv'
+
+        response = StreamingHttpResponse(iter_lines(fmt), content_type='text/csv' if fmt == 'csv' else 'application/x-ndjson')
+        response['Content-Disposition'] = f'attachment; filename="inventory.{fmt}"'
+        return response
 
     def stock_status(self, obj):
         if obj.stock <= 0:
@@ -262,9 +420,9 @@ class ProductSizeInventoryAdmin(admin.ModelAdmin):
 
 
 @admin.register(Image)
-class ImageAdmin(admin.ModelAdmin):
+class ImageAdmin(AutocompleteFilterMixin, admin.ModelAdmin):
     list_display = ('product', 'file_preview')
-    list_filter = ('product',)
+    list_filter = (autocomplete_filter('product', 'Товар'),)
     search_fields = ('product__name',)
     autocomplete_fields = ['product']
 
@@ -275,6 +433,83 @@ class ImageAdmin(admin.ModelAdmin):
     file_preview.short_description = 'Изображение'
 
 
+class ReadOnlyRollupAdmin(admin.ModelAdmin):
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(DailySales)
+class DailySalesAdmin(ReadOnlyRollupAdmin):
+    list_display = ('date', 'orders_count', 'units', 'revenue')
+    date_hierarchy = 'date'
+    change_list_template = 'admin/product/dailysales/change_list.html'
+
+    def get_urls(self):
+        urls = [
+            path('dashboard/', self.admin_site.admin_view(self.dashboard_view), name='product_sales_dashboard'),
+        ]
+        return urls + super().get_urls()
+
+    def dashboard_view(self, request):
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        try:
+            days = min(max(int(request.GET.get('days', 30)), 1), 366)
+        except ValueError:
+            days = 30
+        since = timezone.localdate() - timedelta(days=days - 1)
+
+        daily = list(DailySales.objects.filter(date__gte=since).order_by('date'))
+        top_products = (
+            DailyProductSales.objects.filter(date__gte=since)
+            .values('product__name', 'size__name')
+            .annotate(units=Sum('units'), revenue=Sum('revenue'))
+            .order_by('-units')[:10]
+        )
+        latest_snapshot = StockSnapshot.objects.order_by('-date').values_list('date', flat=True).first()
+        low_stock = (
+            StockSnapshot.objects.filter(date=latest_snapshot, stock__lt=settings.LOW_STOCK_THRESHOLD)
+            .select_related('product', 'size')
+            .order_by('stock')[:50]
+            if latest_snapshot else []
+        )
+
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Аналитика продаж',
+            'days': days,
+            'daily': daily,
+            'totals': {
+                'orders_count': sum(row.orders_count for row in daily),
+                'units': sum(row.units for row in daily),
+                'revenue': sum(row.revenue for row in daily),
+            },
+            'top_products': top_products,
+            'latest_snapshot': latest_snapshot,
+            'low_stock': low_stock,
+        }
+        return render(request, 'admin/product/dailysales/dashboard.html', context)
+
+
+@admin.register(DailyProductSales)
+class DailyProductSalesAdmin(AutocompleteFilterMixin, ReadOnlyRollupAdmin):
+    list_display = ('date', 'product', 'size', 'units', 'revenue')
+    list_select_related = ('product', 'size')
+    list_filter = (autocomplete_filter('product', 'Товар'), 'size')
+    date_hierarchy = 'date'
+
+
+@admin.register(StockSnapshot)
+class StockSnapshotAdmin(ReadOnlyRollupAdmin):
+    list_display = ('date', 'product', 'size', 'stock')
+    list_select_related = ('product', 'size')
+    date_hierarchy = 'date'
+
+
 admin.site.site_header = 'Администрирование магазина кепок'
 admin.site.site_title = 'Панель управления магазином'
 admin.site.index_title = 'Управление магазином кепок'
@@ -0,0 +1,109 @@
+from django import forms
+from django.contrib import admin
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+class AutocompleteFilter(admin.ListFilter):
+    """Фильтр по внешнему ключу с поиском через autocomplete вместо списка всех объектов.
+
+    Использует autocomplete_fields модели-админки, поэтому страница не
+    выгружает все связанные записи: в HTML попадает только выбранный объект.
+    """
+    template = 'admin/product/autocomplete_filter.html'
+    field_name = None
+
+    def __init__(self, request, params, model, model_admin):
+        super().__init__(request, params, model, model_admin)
+        self.field = model._meta.get_field(self.field_name)
+        self.parameter_name = f'{self.field_name}__{self.field.target_field.name}__exact'
+        if self.parameter_name in params:
+            self.used_parameters[self.parameter_name] = params.pop(self.parameter_name)[-1]
+        self.model_admin = model_admin
+
+    def value(self):
+        return self.used_parameters.get(self.parameter_name)
+
+    def has_output(self):
+        return True
+
+    def expected_parameters(self):
+        return [self.parameter_name]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(**{self.parameter_name: self.value()})
+        return queryset
+
+    def choices(self, changelist):
+        yield {
+            'selected': self.value() is None,
+            'query_string': changelist.get_query_string(remove=[self.parameter_name]),
+            'display': 'Все',
+        }
+
+    def rendered_widget(self):
+        form_field = forms.ModelChoiceField(
+            queryset=self.field.remote_field.model._default_manager.all(),
+            required=False,
+            widget=AutocompleteSelect(self.field, self.model_admin.admin_site),
+        )
+        return form_field.widget.render(self.parameter_name, self.value())
+
+
+def autocomplete_filter(field_name, title):
+    return type(f'{field_name.title()}AutocompleteFilter', (AutocompleteFilter,), {
+        'field_name': field_name,
+        'title': title,
+    })
+
+
+class AutocompleteFilterMixin:
+    """Подключает к changelist скрипты select2 для AutocompleteFilter."""
+
+    @property
+    def media(self):
+        media = super().media
+        filters = [f for f in self.list_filter if isinstance(f, type) and issubclass(f, AutocompleteFilter)]
+        if filters:
+            field = self.model._meta.get_field(filters[0].field_name)
+            media += AutocompleteSelect(field, self.admin_site).media
+            media += forms.Media(js=['admin/js/autocomplete_filter.js'])
+        return media
+
+
+def estimate_table_rows(model, using):
+    """Оценка числа строк таблицы из статистики БД или None, если её нет."""
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [table])
+        elif connection.vendor == 'sqlite':
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+            if cursor.fetchone() is None:
+                return None
+            cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1', [table])
+        else:
+            return None
+        row = cursor.fetchone()
+    if not row or row[0] is None:
+        return None
+    estimate = int(str(row[0]).split()[0])
+    return estimate if estimate > 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Для нефильтрованного списка большой таблицы берёт оценку из статистики вместо COUNT(*)."""
+    exact_count_threshold = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimate_table_rows(queryset.model, queryset.db)
+            if estimate is not None and estimate > self.exact_count_threshold:
+                return estimate
+        return super().count
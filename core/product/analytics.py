@@ -0,0 +1,124 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .choices import OrderStatusEnum
+from .models import Order, OrderItem, ProductSizeInventory, DailySales, DailyProductSales, StockSnapshot
+
+
+def _increment(model, lookup, **deltas):
+    updates = {field: F(field) + value for field, value in deltas.items()}
+    if model.objects.filter(**lookup).update(**updates):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **deltas)
+        return
+    except IntegrityError:
+        # Строку за этот день уже создала параллельная транзакция
+        pass
+    model.objects.filter(**lookup).update(**updates)
+
+
+def record_order_accepted(order, items):
+    """Добавляет принятый заказ в дневные агрегаты; дата — день создания заказа."""
+    day = timezone.localdate(order.created_at)
+    _increment(
+        DailySales, {'date': day},
+        orders_count=1,
+        units=sum(item.quantity for item in items),
+        revenue=order.total,
+    )
+    for item in items:
+        _increment(
+            DailyProductSales, {'date': day, 'product_id': item.product_id, 'size_id': item.size_id},
+            units=item.quantity,
+            revenue=item.price * item.quantity,
+        )
+
+
+def _upsert_snapshot(rows, day, batch_size):
+    snapshots = [
+        StockSnapshot(date=day, product_id=product_id, size_id=size_id, stock=stock)
+        for product_id, size_id, stock in rows
+    ]
+    StockSnapshot.objects.bulk_create(
+        snapshots,
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=['date', 'product', 'size'],
+        update_fields=['stock'],
+    )
+    return len(snapshots)
+
+
+def snapshot_stock(rows, day=None, batch_size=2000):
+    """Записывает остатки (product_id, size_id, stock) в снимок за день, перезаписывая прежние значения.
+
+    Первая запись за день сначала переносит в снимок все текущие остатки,
+    чтобы снимок за день оставался полным, а не только по изменённым строкам.
+    """
+    day = day or timezone.localdate()
+    if not StockSnapshot.objects.filter(date=day).exists():
+        snapshot_all_stock(day, batch_size)
+    return _upsert_snapshot(rows, day, batch_size)
+
+
+def snapshot_all_stock(day=None, batch_size=2000):
+    day = day or timezone.localdate()
+    rows = ProductSizeInventory.objects.values_list('product_id', 'size_id', 'stock').iterator(chunk_size=batch_size)
+    total = 0
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            total += _upsert_snapshot(batch, day, batch_size)
+            batch = []
+    if batch:
+        total += _upsert_snapshot(batch, day, batch_size)
+    return total
+
+
+def rebuild_sales_rollups(batch_size=2000):
+    """Пересчитывает дневные агрегаты по всем принятым заказам одной группировкой на таблицу."""
+    daily = (
+        Order.objects.filter(status=OrderStatusEnum.ACCEPTED)
+        .annotate(day=TruncDate('created_at'))
+        .values('day')
+        .annotate(orders_count=Count('id'), revenue=Sum('total'))
+        .order_by()
+    )
+    per_product = (
+        OrderItem.objects.filter(order__status=OrderStatusEnum.ACCEPTED)
+        .annotate(day=TruncDate('order__created_at'))
+        .values('day', 'product_id', 'size_id')
+        .annotate(units=Sum('quantity'), revenue=Sum(F('quantity') * F('price')))
+        .order_by()
+    )
+
+    with transaction.atomic():
+        DailySales.objects.all().delete()
+        DailyProductSales.objects.all().delete()
+
+        product_rows = [
+            DailyProductSales(
+                date=row['day'], product_id=row['product_id'], size_id=row['size_id'],
+                units=row['units'], revenue=row['revenue'],
+            )
+            for row in per_product
+        ]
+        units_per_day = {}
+        for row in product_rows:
+            units_per_day[row.date] = units_per_day.get(row.date, 0) + row.units
+
+        DailySales.objects.bulk_create([
+            DailySales(
+                date=row['day'], orders_count=row['orders_count'],
+                units=units_per_day.get(row['day'], 0), revenue=row['revenue'],
+            )
+            for row in daily
+        ], batch_size=batch_size)
+        DailyProductSales.objects.bulk_create(product_rows, batch_size=batch_size)
+
+    return len(product_rows)
@@ -0,0 +1,222 @@
+import csv
+import hashlib
+import json
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+
+from .choices import ProductStatusEnum
+from .inventory_io import import_inventory
+from .models import Category, Product, Image
+
+
+MAIN_COVER_DIR = 'products/main_cover'
+DETAIL_IMAGE_DIR = 'products/detail_image'
+PRODUCT_FIELDS = ('name', 'category_id', 'description', 'main_cover', 'price',
+                  'discount_percent', 'status', 'is_active')
+
+
+class CatalogImportError(Exception):
+    pass
+
+
+class CatalogImportReport:
+    def __init__(self):
+        self.categories_created = 0
+        self.products_created = 0
+        self.products_updated = 0
+        self.images_created = 0
+        self.files_copied = 0
+        self.files_skipped = 0
+        self.inventory = None
+
+    def __str__(self):
+        return (f"категорий создано: {self.categories_created}, товаров создано: {self.products_created}, "
+                f"обновлено: {self.products_updated}, изображений добавлено: {self.images_created}, "
+                f"файлов скопировано: {self.files_copied}, пропущено без изменений: {self.files_skipped}, "
+                f"остатки — {self.inventory}")
+
+
+def _split(value, separator='|'):
+    return [item.strip() for item in (value or '').split(separator) if item.strip()]
+
+
+def read_manifest(path):
+    """Читает манифест JSON (список объектов) или CSV.
+
+    В CSV списки изображений и остатки пишутся через "|": images="a.jpg|b.jpg",
+    inventory="S:5|M:3".
+    """
+    path = Path(path)
+    if path.suffix.lower() == '.json':
+        with path.open(encoding='utf-8') as stream:
+            return json.load(stream)
+    if path.suffix.lower() == '.csv':
+        entries = []
+        with path.open(encoding='utf-8-sig', newline='') as stream:
+            for row in csv.DictReader(stream):
+                row['images'] = _split(row.get('images'))
+                row['inventory'] = dict(item.split(':', 1) for item in _split(row.get('inventory')))
+                entries.append(row)
+        return entries
+    raise CatalogImportError("Манифест должен быть в формате .json или .csv")
+
+
+def _validate(index, entry):
+    try:
+        price = Decimal(str(entry['price']))
+    except (KeyError, InvalidOperation):
+        raise CatalogImportError(f"Запись {index}: некорректная цена")
+    for field in ('sku', 'name', 'category', 'main_cover'):
+        if not entry.get(field):
+            raise CatalogImportError(f"Запись {index}: не заполнено поле {field}")
+    status = entry.get('status') or ProductStatusEnum.ON_SALE
+    if status not in ProductStatusEnum.values:
+        raise CatalogImportError(f"Запись {index}: неизвестный статус {status}")
+    is_active = entry.get('is_active', True)
+    if isinstance(is_active, str):
+        is_active = is_active.strip().lower() not in ('0', 'false', 'no', '')
+    return {
+        'sku': str(entry['sku']).strip(),
+        'name': entry['name'],
+        'category': entry['category'].strip(),
+        'description': entry.get('description', ''),
+        'price': price,
+        'discount_percent': int(entry.get('discount_percent') or 0),
+        'status': status,
+        'is_active': is_active,
+        'main_cover': entry['main_cover'],
+        'images': list(entry.get('images') or []),
+        'inventory': {size: int(stock) for size, stock in (entry.get('inventory') or {}).items()},
+    }
+
+
+def _validate_entries(entries):
+    validated, seen = [], {}
+    for index, entry in enumerate(entries, start=1):
+        entry = _validate(index, entry)
+        if entry['sku'] in seen:
+            raise CatalogImportError(
+                f"Запись {index}: артикул {entry['sku']} уже указан в записи {seen[entry['sku']]}"
+            )
+        seen[entry['sku']] = index
+        validated.append(entry)
+    return validated
+
+
+def _store_file(source, directory):
+    """Копирует файл в хранилище под именем по sha256 содержимого.
+
+    Повторная загрузка того же содержимого не копирует файл заново.
+    """
+    digest = hashlib.sha256()
+    with source.open('rb') as stream:
+        for chunk in iter(lambda: stream.read(1024 * 1024), b''):
+            digest.update(chunk)
+    name = f"{directory}/{digest.hexdigest()}{source.suffix.lower()}"
+    if default_storage.exists(name):
+        return name, False
+    with source.open('rb') as stream:
+        saved = default_storage.save(name, File(stream))
+    return saved, True
+
+
+def import_catalog(entries, images_dir, workers=8, batch_size=500):
+    report = CatalogImportReport()
+    images_dir = Path(images_dir)
+    entries = _validate_entries(entries)
+
+    jobs = set()
+    for entry in entries:
+        jobs.add((entry['main_cover'], MAIN_COVER_DIR))
+        jobs.update((image, DETAIL_IMAGE_DIR) for image in entry['images'])
+    missing = sorted({filename for filename, _ in jobs if not (images_dir / filename).is_file()})
+    if missing:
+        raise CatalogImportError(f"Не найдены файлы изображений: {', '.join(missing[:10])}")
+
+    jobs = sorted(jobs)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(lambda job: _store_file(images_dir / job[0], job[1]), jobs)
+        stored = {}
+        for job, (name, copied) in zip(jobs, results):
+            stored[job] = name
+            if copied:
+                report.files_copied += 1
+            else:
+                report.files_skipped += 1
+
+    with transaction.atomic():
+        categories = dict(Category.objects.filter(
+            name__in={entry['category'] for entry in entries}
+        ).values_list('name', 'id'))
+        new_categories = [Category(name=name) for name in {entry['category'] for entry in entries} - categories.keys()]
+        for category in Category.objects.bulk_create(new_categories, batch_size=batch_size):
+            categories[category.name] = category.id
+        report.categories_created = len(new_categories)
+
+        existing = Product.objects.in_bulk([entry['sku'] for entry in entries], field_name='sku')
+        to_create, to_update = [], []
+        for entry in entries:
+            values = {
+                'name': entry['name'],
+                'category_id': categories[entry['category']],
+                'description': entry['description'],
+                'main_cover': stored[(entry['main_cover'], MAIN_COVER_DIR)],
+                'price': entry['price'],
+                'discount_percent': entry['discount_percent'],
+                'status': entry['status'],
+                'is_active': entry['is_active'],
+            }
+            product = existing.get(entry['sku'])
+            if product is None:
+                to_create.append(Product(sku=entry['sku'], **values))
+                continue
+            changed = False
+            for field, value in values.items():
+                current = getattr(product, field)
+                if field == 'main_cover':
+                    current = current.name
+                if current != value:
+                    setattr(product, field, value)
+                    changed = True
+            if changed:
+                product.updated_at = timezone.now()
+                to_update.append(product)
+
+        Product.objects.bulk_create(to_create, batch_size=batch_size)
+        Product.objects.bulk_update(to_update, PRODUCT_FIELDS + ('updated_at',), batch_size=batch_size)
+        report.products_created = len(to_create)
+        report.products_updated = len(to_update)
+
+        product_ids = dict(Product.objects.filter(
+            sku__in=[entry['sku'] for entry in entries]
+        ).values_list('sku', 'id'))
+        existing_images = set(Image.objects.filter(
+            product_id__in=product_ids.values()
+        ).values_list('product_id', 'file'))
+        new_images = []
+        for entry in entries:
+            product_id = product_ids[entry['sku']]
+            for image in entry['images']:
+                key = (product_id, stored[(image, DETAIL_IMAGE_DIR)])
+                if key not in existing_images:
+                    existing_images.add(key)
+                    new_images.append(Image(product_id=key[0], file=key[1]))
+        Image.objects.bulk_create(new_images, batch_size=batch_size)
+        report.images_created = len(new_images)
+
+        report.inventory = import_inventory(
+            (
+                {'product_id': product_ids[entry['sku']], 'size': size, 'stock': stock}
+                for entry in entries
+                for size, stock in entry['inventory'].items()
+            ),
+            batch_size=batch_size,
+        )
+
+    return report
@@ -0,0 +1,75 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from .models import Favorite, Product
+
+
+def _cache():
+    return caches['favorites']
+
+
+def _key(user_id):
+    return f"favorite-ids:{user_id}"
+
+
+def favorite_ids(user):
+    """Множество id избранных товаров пользователя; один запрос при промахе кеша."""
+    if not user.is_authenticated:
+        return frozenset()
+    ids = _cache().get(_key(user.pk))
+    if ids is None:
+        ids = sorted(Favorite.objects.filter(user=user).values_list('product_id', flat=True))
+        _cache().set(_key(user.pk), ids, settings.FAVORITE_IDS_CACHE_TTL)
+    return frozenset(ids)
+
+
+def invalidate_favorite_ids(user_id):
+    _cache().delete(_key(user_id))
+
+
+def _active_product_ids(product_ids):
+    return set(Product.objects.filter(pk__in=product_ids, is_active=True).values_list('pk', flat=True))
+
+
+def add_favorite(user, product_id):
+    """Добавляет товар в избранное; повторный вызов ничего не меняет.
+
+    INSERT с игнорированием конфликта вместо get_or_create: двойное нажатие
+    не приводит к IntegrityError. Возвращает False, если товар недоступен.
+    """
+    if not _active_product_ids([product_id]):
+        return False
+    Favorite.objects.bulk_create([Favorite(user=user, product_id=product_id)], ignore_conflicts=True)
+    # Сброс после коммита: иначе параллельный запрос может снова закешировать старое множество
+    transaction.on_commit(lambda: invalidate_favorite_ids(user.pk))
+    return True
+
+
+def remove_favorite(user, product_id):
+    """Удаляет товар из избранного; возвращает True, если запись была.
+
+    У Favorite нет сигналов и зависимых моделей, поэтому удаление — один DELETE.
+    """
+    deleted, _ = Favorite.objects.filter(user=user, product_id=product_id).delete()
+    if deleted:
+        transaction.on_commit(lambda: invalidate_favorite_ids(user.pk))
+    return bool(deleted)
+
+
+@transaction.atomic
+def sync_favorites(user, add=(), remove=()):
+    """Применяет накопленные офлайн изменения избранного одной транзакцией.
+
+    Недоступные товары из add пропускаются и возвращаются в ignored.
+    """
+    available = _active_product_ids(add) if add else set()
+    if available:
+        Favorite.objects.bulk_create(
+            [Favorite(user=user, product_id=product_id) for product_id in sorted(available)],
+            ignore_conflicts=True,
+        )
+    if remove:
+        Favorite.objects.filter(user=user, product_id__in=remove).delete()
+    transaction.on_commit(lambda: invalidate_favorite_ids(user.pk))
+    return sorted(set(add) - available)
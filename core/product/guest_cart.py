@@ -0,0 +1,93 @@
+import secrets
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from .models import Cart, CartItem, ProductSizeInventory
+
+
+def _cache():
+    return caches['guest_carts']
+
+
+def _key(token):
+    return f"guest-cart:{token}"
+
+
+def create_guest_cart():
+    token = secrets.token_urlsafe(24)
+    _cache().set(_key(token), {}, settings.GUEST_CART_TTL)
+    return token
+
+
+def get_guest_cart(token):
+    """Возвращает строки гостевой корзины {(product_id, size_name): quantity} или None."""
+    if not token:
+        return None
+    lines = _cache().get(_key(token))
+    if lines is None:
+        return None
+    return {(int(product_id), size_name): quantity
+            for product_id, size_name, quantity in lines}
+
+
+def save_guest_cart(token, lines):
+    _cache().set(
+        _key(token),
+        [(product_id, size_name, quantity) for (product_id, size_name), quantity in lines.items()],
+        settings.GUEST_CART_TTL,
+    )
+
+
+def delete_guest_cart(token):
+    _cache().delete(_key(token))
+
+
+def merge_guest_cart(token, user):
+    """Переносит гостевую корзину в корзину пользователя одним bulk upsert.
+
+    Количества складываются с уже лежащими в корзине и ограничиваются
+    остатком на складе; недоступные позиции пропускаются.
+    """
+    lines = get_guest_cart(token)
+    if not lines:
+        return 0
+
+    inventory = {
+        (row.product_id, row.size.name): row
+        for row in ProductSizeInventory.objects.filter(
+            product_id__in={product_id for product_id, _ in lines},
+            product__is_active=True,
+            size__name__in={size_name for _, size_name in lines},
+            stock__gt=0,
+        ).select_related('size')
+    }
+
+    with transaction.atomic():
+        cart, _ = Cart.objects.get_or_create(user=user)
+        existing = {
+            (item.product_id, item.size_id): item.quantity
+            for item in cart.items.select_for_update().only('product_id', 'size_id', 'quantity')
+        }
+        items = []
+        for key, quantity in lines.items():
+            row = inventory.get(key)
+            if row is None:
+                continue
+            total = existing.get((row.product_id, row.size_id), 0) + quantity
+            items.append(CartItem(
+                cart=cart,
+                product_id=row.product_id,
+                size_id=row.size_id,
+                quantity=min(total, row.stock),
+            ))
+        CartItem.objects.bulk_create(
+            items,
+            update_conflicts=True,
+            unique_fields=['cart', 'product', 'size'],
+            update_fields=['quantity'],
+        )
+
+    delete_guest_cart(token)
+    return len(items)
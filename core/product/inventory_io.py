@@ -0,0 +1,170 @@
+import csv
+import json
+from itertools import islice
+
+from django.db import transaction
+
+from .analytics import snapshot_stock
+from .models import Product, Size, ProductSizeInventory
+from .stock import sync_product_stock
+from .streaming import Echo
+
+
+FORMATS = ('csv', 'jsonl')
+FIELDS = ('product_id', 'size', 'stock')
+
+
+class InventoryFormatError(ValueError):
+    pass
+
+
+class InventoryImportReport:
+    max_errors = 100
+
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.invalid = 0
+        self.errors = []
+
+    def add_error(self, line, message):
+        self.invalid += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append(f"Строка {line}: {message}")
+
+    def __str__(self):
+        return (f"создано: {self.created}, обновлено: {self.updated}, "
+                f"без изменений: {self.unchanged}, ошибок: {self.invalid}")
+
+
+def read_rows(stream, fmt):
+    """Построчно читает текстовый поток, не загружая файл целиком.
+
+    Строка, которую нельзя разобрать как JSON, прерывает импорт
+    с InventoryFormatError и номером строки.
+    """
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+    elif fmt == 'jsonl':
+        for number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise InventoryFormatError(f"Строка {number}: некорректный JSON ({e.msg})") from e
+            yield row
+    else:
+        raise ValueError(f"Формат должен быть одним из: {', '.join(FORMATS)}")
+
+
+def iter_lines(fmt, chunk_size=2000):
+    """Строки экспорта по одной: подходит и для файла, и для StreamingHttpResponse."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Формат должен быть одним из: {', '.join(FORMATS)}")
+    queryset = ProductSizeInventory.objects.order_by('product_id', 'size__name').values_list(
+        'product_id', 'size__name', 'stock'
+    )
+    if fmt == 'csv':
+        writer = csv.writer(Echo())
+        yield writer.writerow(FIELDS)
+        for row in queryset.iterator(chunk_size=chunk_size):
+            yield writer.writerow(row)
+    else:
+        for row in queryset.iterator(chunk_size=chunk_size):
+            yield json.dumps(dict(zip(FIELDS, row))) + '\n'
+
+
+def write_rows(stream, fmt, chunk_size=2000):
+    for line in iter_lines(fmt, chunk_size):
+        stream.write(line)
+
+
+def _parse(line, raw, sizes, report):
+    try:
+        product_id = int(raw['product_id'])
+        size_name = str(raw['size']).strip()
+        stock = int(raw['stock'])
+    except (KeyError, TypeError, ValueError):
+        report.add_error(line, "ожидаются поля product_id, size и stock")
+        return None
+    if size_name not in sizes:
+        report.add_error(line, f"неизвестный размер {size_name}")
+        return None
+    if stock < 0:
+        report.add_error(line, "остаток не может быть отрицательным")
+        return None
+    return product_id, sizes[size_name], stock
+
+
+def import_inventory(rows, batch_size=1000, dry_run=False, on_change=None):
+    """Загружает остатки пачками: проверка пар (товар, размер) и upsert через bulk_create.
+
+    Все пачки применяются в одной транзакции; при dry_run она откатывается.
+    on_change(product_id, size_name, old_stock, new_stock) вызывается для
+    каждой изменённой строки (old_stock равен None для новых записей).
+    """
+    report = InventoryImportReport()
+    sizes = dict(Size.objects.values_list('name', 'id'))
+    size_names = {size_id: name for name, size_id in sizes.items()}
+    numbered = enumerate(rows, start=2)
+
+    with transaction.atomic():
+        while True:
+            chunk = list(islice(numbered, batch_size))
+            if not chunk:
+                break
+
+            parsed = {}
+            for line, raw in chunk:
+                row = _parse(line, raw, sizes, report)
+                if row is not None:
+                    # Повтор пары в файле: побеждает последняя строка
+                    parsed[row[:2]] = (line, row[2])
+
+            product_ids = set(Product.objects.filter(
+                id__in={product_id for product_id, _ in parsed}
+            ).values_list('id', flat=True))
+            existing = {
+                (product_id, size_id): stock
+                for product_id, size_id, stock in ProductSizeInventory.objects.filter(
+                    product_id__in=product_ids
+                ).values_list('product_id', 'size_id', 'stock')
+            }
+
+            rows = []
+            for (product_id, size_id), (line, stock) in parsed.items():
+                if product_id not in product_ids:
+                    report.add_error(line, f"товар {product_id} не найден")
+                    continue
+                old_stock = existing.get((product_id, size_id))
+                if old_stock is None:
+                    report.created += 1
+                elif old_stock != stock:
+                    report.updated += 1
+                else:
+                    report.unchanged += 1
+                    continue
+                rows.append(ProductSizeInventory(product_id=product_id, size_id=size_id, stock=stock))
+                if on_change:
+                    on_change(product_id, size_names[size_id], old_stock, stock)
+
+            # Один upsert на пачку: bulk_update строит CASE WHEN по каждой строке и на
+            # пересчёте существующих остатков оказывается в разы медленнее вставки
+            ProductSizeInventory.objects.bulk_create(
+                rows,
+                batch_size=batch_size,
+                update_conflicts=True,
+                unique_fields=['product', 'size'],
+                update_fields=['stock'],
+            )
+            # bulk-операции не отправляют post_save, поэтому синхронизируем товары
+            # и дневной снимок остатков явно
+            sync_product_stock({row.product_id for row in rows})
+            snapshot_stock([(row.product_id, row.size_id, row.stock) for row in rows])
+
+        if dry_run:
+            transaction.set_rollback(True)
+
+    return report
@@ -0,0 +1,104 @@
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, OperationalError
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from product.models import Category, Product, Size, ProductSizeInventory
+
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Замер пропускной способности записи в корзину при множестве параллельных клиентов. '
+        'Запустите с DJANGO_PROFILE=dev и DJANGO_PROFILE=bench, чтобы сравнить результаты.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=16, help='Количество параллельных клиентов')
+        parser.add_argument('--requests', type=int, default=50, help='Запросов на одного клиента')
+        parser.add_argument('--keep', action='store_true', help='Не удалять созданные данные')
+
+    def handle(self, *args, **options):
+        clients = options['clients']
+        requests_per_client = options['requests']
+        prefix = f"bench-{uuid.uuid4().hex[:8]}"
+
+        category = Category.objects.create(name=prefix)
+        product = Product.objects.create(
+            category=category,
+            name=prefix,
+            description=prefix,
+            main_cover='products/main_cover/bench.jpg',
+            price=100,
+        )
+        size, _ = Size.objects.get_or_create(name='M')
+        ProductSizeInventory.objects.create(
+            product=product, size=size, stock=clients * requests_per_client + 1
+        )
+        users = [
+            User.objects.create_user(
+                email=f"{prefix}-{i}@example.com",
+                phone_number='0000000000',
+                username=f"{prefix}-{i}",
+                password=None,
+            )
+            for i in range(clients)
+        ]
+
+        url = reverse('cart')
+        payload = {'product': product.id, 'size': size.name, 'quantity': 1}
+        results = {'ok': 0, 'failed': 0, 'locked': 0}
+        lock = threading.Lock()
+        barrier = threading.Barrier(clients)
+
+        def worker(user):
+            client = APIClient(SERVER_NAME='localhost')
+            client.force_authenticate(user)
+            ok = failed = locked = 0
+            barrier.wait()
+            try:
+                for _ in range(requests_per_client):
+                    try:
+                        response = client.post(url, payload, format='json')
+                    except OperationalError:
+                        locked += 1
+                        continue
+                    if response.status_code == 201:
+                        ok += 1
+                    else:
+                        failed += 1
+            finally:
+                connection.close()
+            with lock:
+                results['ok'] += ok
+                results['failed'] += failed
+                results['locked'] += locked
+
+        threads = [threading.Thread(target=worker, args=(user,)) for user in users]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        db = settings.DATABASES['default']
+        total = clients * requests_per_client
+        self.stdout.write(f"Профиль: {settings.PROFILE}, backend: {db['ENGINE']}, "
+                          f"CONN_MAX_AGE: {db.get('CONN_MAX_AGE', 0)}, OPTIONS: {db.get('OPTIONS', {})}")
+        self.stdout.write(f"Клиентов: {clients}, запросов: {total}, время: {elapsed:.2f} с")
+        self.stdout.write(f"Успешно: {results['ok']}, ошибок ответа: {results['failed']}, "
+                          f"ошибок блокировки БД: {results['locked']}")
+        self.stdout.write(self.style.SUCCESS(f"Пропускная способность: {results['ok'] / elapsed:.1f} запросов/с"))
+
+        if not options['keep']:
+            User.objects.filter(username__startswith=prefix).delete()
+            category.delete()
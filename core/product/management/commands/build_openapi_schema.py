@@ -0,0 +1,37 @@
+import hashlib
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from drf_spectacular.renderers import OpenApiYamlRenderer
+from drf_spectacular.settings import spectacular_settings
+
+
+class Command(BaseCommand):
+    help = (
+        'Собирает схему OpenAPI в OPENAPI_SCHEMA_FILE. Запускается при деплое; '
+        'вне dev-профиля api/schema/ отдаёт этот файл вместо генерации на каждый запрос.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', default=None, help='Куда записать схему (по умолчанию OPENAPI_SCHEMA_FILE)')
+
+    def handle(self, *args, **options):
+        path = options['file'] or str(settings.OPENAPI_SCHEMA_FILE)
+        generator = spectacular_settings.DEFAULT_GENERATOR_CLASS()
+        schema = generator.get_schema(request=None, public=True)
+        content = OpenApiYamlRenderer().render(schema, renderer_context={})
+
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        # Запись во временный файл и переименование: работающие процессы не увидят недописанную схему
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as tmp:
+            tmp.write(content)
+        os.replace(tmp_path, path)
+
+        digest = hashlib.sha256(content).hexdigest()[:16]
+        self.stdout.write(self.style.SUCCESS(
+            f"Схема версии {schema['info'].get('version', '')} записана в {path} ({len(content)} байт, ETag {digest})"
+        ))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from product.inventory_io import FORMATS, iter_lines, write_rows
+
+
+class Command(BaseCommand):
+    help = 'Потоковый экспорт остатков ProductSizeInventory в CSV или JSONL'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=FORMATS, default='csv')
+        parser.add_argument('--output', help='Путь к файлу (по умолчанию stdout)')
+
+    def handle(self, *args, **options):
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as stream:
+                write_rows(stream, options['format'])
+        else:
+            for line in iter_lines(options['format']):
+                self.stdout.write(line, ending='')
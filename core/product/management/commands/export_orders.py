@@ -0,0 +1,55 @@
+from datetime import datetime, time, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from product.choices import OrderStatusEnum
+from product.order_export import FORMATS, order_lines, iter_lines, write_parquet
+
+
+def parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError(f"Дата {value} должна быть в формате ГГГГ-ММ-ДД")
+
+
+class Command(BaseCommand):
+    help = 'Потоковая выгрузка заказов построчно (по позициям) в CSV, JSONL или Parquet'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='date_from', help='Начальная дата включительно, ГГГГ-ММ-ДД')
+        parser.add_argument('--to', dest='date_to', help='Конечная дата включительно, ГГГГ-ММ-ДД')
+        parser.add_argument('--status', action='append', choices=OrderStatusEnum.values,
+                            help='Статус заказа, можно указать несколько раз')
+        parser.add_argument('--format', choices=FORMATS, default='csv')
+        parser.add_argument('--output', help='Путь к файлу (для parquet обязателен)')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        tz = timezone.get_current_timezone()
+        date_from = date_to = None
+        if options['date_from']:
+            date_from = datetime.combine(parse_date(options['date_from']), time.min, tzinfo=tz)
+        if options['date_to']:
+            date_to = datetime.combine(parse_date(options['date_to']) + timedelta(days=1), time.min, tzinfo=tz)
+
+        queryset = order_lines(date_from=date_from, date_to=date_to, statuses=options['status'])
+
+        if options['format'] == 'parquet':
+            if not options['output']:
+                raise CommandError("Для формата parquet укажите --output")
+            try:
+                written = write_parquet(queryset, options['output'])
+            except ValueError as e:
+                raise CommandError(str(e))
+            self.stderr.write(f"Выгружено строк: {written}")
+            return
+
+        lines = iter_lines(queryset, options['format'], chunk_size=options['chunk_size'])
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as stream:
+                stream.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending='')
@@ -0,0 +1,41 @@
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from product.catalog_import import CatalogImportError, read_manifest, import_catalog
+
+
+class Command(BaseCommand):
+    help = (
+        'Импорт каталога (категории, товары, изображения, остатки) из манифеста JSON/CSV '
+        'и папки с изображениями. Повторный запуск обновляет товары по артикулу (sku) '
+        'и не копирует неизменённые изображения.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('manifest', help='Путь к манифесту .json или .csv')
+        parser.add_argument('--images', required=True, help='Папка с файлами изображений')
+        parser.add_argument('--workers', type=int, default=8, help='Потоков для копирования изображений')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        images_dir = Path(options['images'])
+        if not images_dir.is_dir():
+            raise CommandError(f"Папка {images_dir} не найдена")
+
+        started = time.perf_counter()
+        try:
+            report = import_catalog(
+                read_manifest(options['manifest']),
+                images_dir,
+                workers=options['workers'],
+                batch_size=options['batch_size'],
+            )
+        except (CatalogImportError, OSError, ValueError) as e:
+            raise CommandError(str(e))
+        elapsed = time.perf_counter() - started
+
+        for error in report.inventory.errors:
+            self.stderr.write(error)
+        self.stdout.write(self.style.SUCCESS(f"Импорт каталога за {elapsed:.2f} с: {report}"))
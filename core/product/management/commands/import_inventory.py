@@ -0,0 +1,47 @@
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from product.inventory_io import FORMATS, InventoryFormatError, read_rows, import_inventory
+
+
+class Command(BaseCommand):
+    help = 'Импорт остатков ProductSizeInventory из CSV (product_id,size,stock) или JSONL'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к файлу')
+        parser.add_argument('--format', choices=FORMATS, help='Формат файла (по умолчанию по расширению)')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help='Проверить и показать изменения без записи')
+        parser.add_argument('--diff', action='store_true', help='Вывести каждое изменение остатка')
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        if not path.exists():
+            raise CommandError(f"Файл {path} не найден")
+        fmt = options['format'] or path.suffix.lstrip('.').lower()
+        if fmt not in FORMATS:
+            raise CommandError(f"Формат должен быть одним из: {', '.join(FORMATS)}")
+
+        def on_change(product_id, size_name, old_stock, new_stock):
+            old = '—' if old_stock is None else old_stock
+            self.stdout.write(f"{product_id} {size_name}: {old} -> {new_stock}")
+
+        started = time.perf_counter()
+        with path.open(encoding='utf-8-sig', newline='') as stream:
+            try:
+                report = import_inventory(
+                    read_rows(stream, fmt),
+                    batch_size=options['batch_size'],
+                    dry_run=options['dry_run'],
+                    on_change=on_change if options['diff'] else None,
+                )
+            except InventoryFormatError as e:
+                raise CommandError(str(e))
+        elapsed = time.perf_counter() - started
+
+        for error in report.errors:
+            self.stderr.write(error)
+        prefix = 'Проверка без записи' if options['dry_run'] else 'Импорт'
+        self.stdout.write(self.style.SUCCESS(f"{prefix} за {elapsed:.2f} с: {report}"))
@@ -0,0 +1,153 @@
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+# Выполняется в отдельном интерпретаторе с -X importtime и повторяет шаги
+# core/wsgi.py: настройки, django.setup(), загрузка middleware, прогрев
+# справочников и первый запрос.
+PROBE = r'''
+import io
+import json
+import sys
+import time
+
+started = time.perf_counter()
+timings = {}
+ready = {}
+
+
+def phase(name, since):
+    timings[name] = round((time.perf_counter() - since) * 1000, 1)
+
+
+since = time.perf_counter()
+import django
+from django.apps.config import AppConfig
+phase('django', since)
+
+original_create = AppConfig.create.__func__
+
+
+def create(cls, entry):
+    config = original_create(cls, entry)
+    original_ready = config.ready
+
+    def timed_ready():
+        ready_started = time.perf_counter()
+        original_ready()
+        ready[config.label] = round((time.perf_counter() - ready_started) * 1000, 1)
+
+    config.ready = timed_ready
+    return config
+
+
+AppConfig.create = classmethod(create)
+
+since = time.perf_counter()
+from django.conf import settings
+settings.INSTALLED_APPS
+phase('settings', since)
+
+since = time.perf_counter()
+django.setup(set_prefix=False)
+phase('setup', since)
+
+since = time.perf_counter()
+from django.core.handlers.wsgi import WSGIHandler
+application = WSGIHandler()
+phase('middleware', since)
+
+since = time.perf_counter()
+from product.reference_cache import reference_cache
+warmed = reference_cache.warm()
+phase('warm', since)
+
+status = []
+since = time.perf_counter()
+response = application({
+    'REQUEST_METHOD': 'GET', 'PATH_INFO': sys.argv[1], 'QUERY_STRING': '',
+    'SERVER_NAME': 'localhost', 'SERVER_PORT': '80', 'HTTP_HOST': 'localhost',
+    'wsgi.input': io.BytesIO(), 'wsgi.url_scheme': 'http', 'wsgi.errors': sys.stderr,
+}, lambda code, headers, exc_info=None: status.append(code))
+b''.join(response)
+phase('first_request', since)
+timings['total'] = round((time.perf_counter() - started) * 1000, 1)
+
+print(json.dumps({
+    'timings': timings, 'ready': ready, 'warmed': warmed, 'status': status[0],
+    'apps': list(settings.INSTALLED_APPS),
+}))
+'''
+
+
+def parse_importtime(stderr):
+    """Строки '-X importtime': 'import time: self [us] | cumulative | module'."""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules.append((name.strip(), int(self_us), int(cumulative_us)))
+    return modules
+
+
+class Command(BaseCommand):
+    help = (
+        'Профиль холодного старта воркера в отдельном процессе: время импорта модулей, '
+        'ready() каждого приложения и первого запроса. Сравните DJANGO_PROFILE=prod и api.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profile', default=settings.PROFILE, choices=settings.PROFILES,
+                            help='DJANGO_PROFILE процесса, который профилируется')
+        parser.add_argument('--path', default='/api/products/sizes/', help='URL первого запроса')
+        parser.add_argument('--top', type=int, default=15, help='Сколько самых дорогих модулей показать')
+        parser.add_argument('--runs', type=int, default=1, help='Сколько раз запустить; берётся медиана')
+
+    def probe(self, options):
+        env = {
+            **os.environ,
+            'DJANGO_SETTINGS_MODULE': 'core.settings',
+            'DJANGO_PROFILE': options['profile'],
+            'DJANGO_ALLOWED_HOSTS': ','.join({*settings.ALLOWED_HOSTS, 'localhost'}),
+        }
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', PROBE, options['path']],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        if result.returncode != 0:
+            raise CommandError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'Процесс завершился с ошибкой')
+        return json.loads(result.stdout.strip().splitlines()[-1]), parse_importtime(result.stderr)
+
+    def handle(self, *args, **options):
+        runs = [self.probe(options) for _ in range(max(1, options['runs']))]
+        runs.sort(key=lambda run: run[0]['timings']['total'])
+        report, modules = runs[len(runs) // 2]
+
+        self.stdout.write(f"Профиль: {options['profile']}, приложений: {len(report['apps'])}, "
+                          f"первый запрос {options['path']}: {report['status']}")
+        for name, value in report['timings'].items():
+            self.stdout.write(f"  {name:<14} {value:>8.1f} мс")
+
+        self.stdout.write('ready() приложений:')
+        for label, value in sorted(report['ready'].items(), key=lambda item: -item[1]):
+            self.stdout.write(f"  {label:<24} {value:>8.1f} мс")
+
+        packages = defaultdict(int)
+        for name, self_us, cumulative_us in modules:
+            packages[name.split('.')[0]] += self_us
+        self.stdout.write(f"Импорт по пакетам (собственное время), всего модулей: {len(modules)}:")
+        for name, self_us in sorted(packages.items(), key=lambda item: -item[1])[:options['top']]:
+            self.stdout.write(f"  {name:<32} {self_us / 1000:>8.1f} мс")
+
+        self.stdout.write('Самые дорогие модули (собственное / с зависимостями):')
+        for name, self_us, cumulative_us in sorted(modules, key=lambda item: -item[1])[:options['top']]:
+            self.stdout.write(f"  {name:<48} {self_us / 1000:>8.1f} / {cumulative_us / 1000:>8.1f} мс")
+
+        self.stdout.write(self.style.SUCCESS(f"Холодный старт до первого ответа: {report['timings']['total']:.1f} мс"))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from product.analytics import rebuild_sales_rollups, snapshot_all_stock
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчёт дневных агрегатов продаж по принятым заказам и снимок текущих остатков. '
+        'С --snapshot-only только снимает остатки (для ежедневного запуска по расписанию).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--snapshot-only', action='store_true')
+
+    def handle(self, *args, **options):
+        if not options['snapshot_only']:
+            rows = rebuild_sales_rollups()
+            self.stdout.write(f"Агрегатов по товарам: {rows}")
+        snapshots = snapshot_all_stock()
+        self.stdout.write(self.style.SUCCESS(f"Снимок остатков: {snapshots} позиций"))
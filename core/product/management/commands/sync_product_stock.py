@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from product.models import Product
+from product.stock import sync_product_stock
+
+
+class Command(BaseCommand):
+    help = (
+        'Разовая сверка total_stock и статусов всех товаров с остатками. '
+        'В обычной работе они пересчитываются автоматически при изменении остатков.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        ids = Product.objects.order_by('id').values_list('id', flat=True)
+        changed = 0
+        batch = []
+        for product_id in ids.iterator(chunk_size=options['batch_size']):
+            batch.append(product_id)
+            if len(batch) >= options['batch_size']:
+                changed += sync_product_stock(batch)
+                batch = []
+        changed += sync_product_stock(batch)
+        self.stdout.write(self.style.SUCCESS(f"Обновлено товаров: {changed}"))
@@ -0,0 +1,17 @@
+# Generated by Django 5.2 on 2026-10-19 06:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0006_paymentqr_order_orderitem'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='productsizeinventory',
+            index=models.Index(fields=['stock'], name='inventory_stock_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2 on 2026-10-19 06:59
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def fill_total_stock(apps, schema_editor):
+    Product = apps.get_model('product', 'Product')
+    ProductSizeInventory = apps.get_model('product', 'ProductSizeInventory')
+    totals = (
+        ProductSizeInventory.objects.filter(product=OuterRef('pk'))
+        .values('product')
+        .annotate(total=Sum('stock'))
+        .values('total')
+    )
+    Product.objects.update(total_stock=Coalesce(Subquery(totals), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0010_sales_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='total_stock',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Общий остаток'),
+        ),
+        migrations.RunPython(fill_total_stock, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-19 07:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0011_product_total_stock'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='receipt_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, unique=True, verbose_name='SHA-256 чека'),
+        ),
+    ]
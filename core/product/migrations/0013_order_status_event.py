@@ -0,0 +1,33 @@
+# Generated by Django 5.2 on 2026-10-19 07:02
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0012_order_receipt_hash'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderStatusEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('from_status', models.CharField(choices=[('in_progress', 'В процессе'), ('accepted', 'Принято'), ('rejected', 'Отклонено')], max_length=20, verbose_name='Предыдущий статус')),
+                ('to_status', models.CharField(choices=[('in_progress', 'В процессе'), ('accepted', 'Принято'), ('rejected', 'Отклонено')], max_length=20, verbose_name='Новый статус')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата изменения')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='status_events', to='product.order', verbose_name='Заказ')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Кто изменил')),
+            ],
+            options={
+                'verbose_name': 'Изменение статуса заказа',
+                'verbose_name_plural': 'История статусов заказов',
+                'ordering': ('created_at', 'id'),
+                'indexes': [models.Index(fields=['order', 'created_at'], name='order_status_event_idx')],
+            },
+        ),
+    ]
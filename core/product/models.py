@@ -102,6 +102,7 @@ class Product(TimeStampedModel):
         related_name='products'
     )
     name = models.CharField('Название', max_length=250)
+    sku = models.CharField('Артикул', max_length=64, unique=True, null=True, blank=True)
     description = models.TextField('Описание')
     main_cover = models.ImageField('Основное фото', upload_to='products/main_cover')
     price = models.DecimalField('Цена', max_digits=10, decimal_places=2)
@@ -117,6 +118,7 @@ class Product(TimeStampedModel):
         verbose_name='Статус',
         max_length=30
     )
+    total_stock = models.PositiveIntegerField('Общий остаток', default=0, editable=False)
 
     def available_sizes(self):
         return self.inventory.filter(stock__gt=0).select_related('size')
@@ -236,6 +238,9 @@ class ProductSizeInventory(models.Model):
         verbose_name = 'Запас товара'
         verbose_name_plural = 'Запасы товаров'
         unique_together = ('product', 'size')
+        indexes = [
+            models.Index(fields=['stock'], name='inventory_stock_idx'),
+        ]
 
 
 class Order(TimeStampedModel):
@@ -253,13 +258,61 @@ class Order(TimeStampedModel):
         default=OrderStatusEnum.IN_PROGRESS
     )
     receipt = models.FileField('Чек', upload_to='orders/receipts', blank=True, null=True)
+    receipt_hash = models.CharField('SHA-256 чека', max_length=64, unique=True, blank=True, null=True, editable=False)
 
     def __str__(self):
         return f"Заказ {self.id} ({self.user.username})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Статус на момент загрузки: по нему pre_save определяет переход без повторного запроса
+        instance._original_status = instance.__dict__.get('status')
+        return instance
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self._original_status = self.__dict__.get('status')
+
     class Meta:
         verbose_name = 'Заказ'
         verbose_name_plural = 'Заказы'
+        indexes = [
+            models.Index(fields=['created_at'], name='order_created_at_idx'),
+            models.Index(fields=['user', 'created_at'], name='order_user_created_at_idx'),
+            models.Index(fields=['status', 'created_at'], name='order_status_created_at_idx'),
+        ]
+
+
+class OrderStatusEvent(models.Model):
+    order = models.ForeignKey(
+        Order,
+        on_delete=models.CASCADE,
+        related_name='status_events',
+        verbose_name='Заказ'
+    )
+    from_status = models.CharField('Предыдущий статус', max_length=20, choices=OrderStatusEnum.choices)
+    to_status = models.CharField('Новый статус', max_length=20, choices=OrderStatusEnum.choices)
+    user = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name='Кто изменил'
+    )
+    created_at = models.DateTimeField('Дата изменения', auto_now_add=True)
+
+    def __str__(self):
+        return f"Заказ {self.order_id}: {self.from_status} → {self.to_status}"
+
+    class Meta:
+        verbose_name = 'Изменение статуса заказа'
+        verbose_name_plural = 'История статусов заказов'
+        ordering = ('created_at', 'id')
+        indexes = [
+            models.Index(fields=['order', 'created_at'], name='order_status_event_idx'),
+        ]
 
 
 class OrderItem(models.Model):
@@ -302,3 +355,70 @@ class PaymentQR(models.Model):
     class Meta:
         verbose_name = 'QR-код оплаты'
         verbose_name_plural = 'QR-коды оплаты'
+
+
+class DailySales(models.Model):
+    date = models.DateField('Дата', unique=True)
+    orders_count = models.PositiveIntegerField('Заказов', default=0)
+    units = models.PositiveIntegerField('Продано единиц', default=0)
+    revenue = models.DecimalField('Выручка', max_digits=14, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"Продажи за {self.date}"
+
+    class Meta:
+        verbose_name = 'Продажи за день'
+        verbose_name_plural = 'Продажи по дням'
+        ordering = ['-date']
+
+
+class DailyProductSales(models.Model):
+    date = models.DateField('Дата')
+    product = models.ForeignKey(
+        'Product',
+        on_delete=models.CASCADE,
+        related_name='daily_sales',
+        verbose_name='Товар'
+    )
+    size = models.ForeignKey(
+        'Size',
+        on_delete=models.CASCADE,
+        verbose_name='Размер'
+    )
+    units = models.PositiveIntegerField('Продано единиц', default=0)
+    revenue = models.DecimalField('Выручка', max_digits=14, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"{self.product.name} ({self.size.name}) за {self.date}"
+
+    class Meta:
+        verbose_name = 'Продажи товара за день'
+        verbose_name_plural = 'Продажи товаров по дням'
+        unique_together = ('date', 'product', 'size')
+
+
+class StockSnapshot(models.Model):
+    date = models.DateField('Дата')
+    product = models.ForeignKey(
+        'Product',
+        on_delete=models.CASCADE,
+        related_name='stock_snapshots',
+        verbose_name='Товар'
+    )
+    size = models.ForeignKey(
+        'Size',
+        on_delete=models.CASCADE,
+        verbose_name='Размер'
+    )
+    stock = models.PositiveIntegerField('Остаток', default=0)
+
+    def __str__(self):
+        return f"{self.product.name} ({self.size.name}): {self.stock} шт. на {self.date}"
+
+    class Meta:
+        verbose_name = 'Снимок остатка'
+        verbose_name_plural = 'Снимки остатков'
+        unique_together = ('date', 'product', 'size')
+        indexes = [
+            models.Index(fields=['date', 'stock'], name='stock_snapshot_date_stock_idx'),
+        ]
@@ -0,0 +1,98 @@
+import csv
+import json
+from itertools import islice
+
+from django.db.models import F
+
+from .models import OrderItem
+from .streaming import Echo
+
+
+COLUMNS = (
+    'order_id', 'created_at', 'status', 'user_id', 'username', 'order_total',
+    'product_id', 'product_name', 'size', 'quantity', 'price',
+)
+FORMATS = ('csv', 'jsonl', 'parquet')
+
+
+def order_lines(orders=None, date_from=None, date_to=None, statuses=None):
+    """Строки заказов для отчёта; фильтры по дате и статусу идут через индекс (status, created_at)."""
+    queryset = OrderItem.objects.all()
+    if orders is not None:
+        queryset = queryset.filter(order__in=orders)
+    if statuses:
+        queryset = queryset.filter(order__status__in=statuses)
+    if date_from:
+        queryset = queryset.filter(order__created_at__gte=date_from)
+    if date_to:
+        queryset = queryset.filter(order__created_at__lt=date_to)
+    return queryset.order_by('order_id', 'id').values_list(
+        'order_id',
+        F('order__created_at'),
+        F('order__status'),
+        F('order__user_id'),
+        F('order__user__username'),
+        F('order__total'),
+        'product_id',
+        F('product__name'),
+        F('size__name'),
+        'quantity',
+        'price',
+    )
+
+
+def _serialize(row):
+    return [value.isoformat() if hasattr(value, 'isoformat') else value for value in row]
+
+
+def iter_lines(queryset, fmt, chunk_size=2000):
+    if fmt == 'csv':
+        writer = csv.writer(Echo())
+        yield writer.writerow(COLUMNS)
+        for row in queryset.iterator(chunk_size=chunk_size):
+            yield writer.writerow(_serialize(row))
+    elif fmt == 'jsonl':
+        for row in queryset.iterator(chunk_size=chunk_size):
+            yield json.dumps(dict(zip(COLUMNS, _serialize(row))), default=str, ensure_ascii=False) + '\n'
+    else:
+        raise ValueError("Построчный вывод поддерживается только для csv и jsonl")
+
+
+def write_parquet(queryset, path, row_group_size=50000):
+    """Колоночный вывод: каждая пачка строк записывается отдельной row group.
+
+    Требует pyarrow; в памяти держится не больше одной пачки.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError("Для формата parquet установите pyarrow")
+
+    schema = pa.schema([
+        ('order_id', pa.int64()),
+        ('created_at', pa.timestamp('us', tz='UTC')),
+        ('status', pa.string()),
+        ('user_id', pa.int64()),
+        ('username', pa.string()),
+        ('order_total', pa.decimal128(10, 2)),
+        ('product_id', pa.int64()),
+        ('product_name', pa.string()),
+        ('size', pa.string()),
+        ('quantity', pa.int64()),
+        ('price', pa.decimal128(10, 2)),
+    ])
+    rows = queryset.iterator(chunk_size=min(row_group_size, 5000))
+    written = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        while True:
+            chunk = list(islice(rows, row_group_size))
+            if not chunk:
+                break
+            columns = list(zip(*chunk))
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+                schema=schema,
+            ))
+            written += len(chunk)
+    return written
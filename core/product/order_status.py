@@ -0,0 +1,121 @@
+import logging
+
+from django.db import transaction
+
+from .analytics import record_order_accepted, snapshot_stock
+from .choices import OrderStatusEnum
+from .models import Order, OrderStatusEvent, ProductSizeInventory
+from .stock import sync_product_stock
+
+
+logger = logging.getLogger(__name__)
+
+# Допустимые переходы статуса заказа; "Принято" — конечный статус
+TRANSITIONS = {
+    OrderStatusEnum.IN_PROGRESS: {OrderStatusEnum.ACCEPTED, OrderStatusEnum.REJECTED},
+    OrderStatusEnum.REJECTED: {OrderStatusEnum.IN_PROGRESS, OrderStatusEnum.ACCEPTED},
+    OrderStatusEnum.ACCEPTED: set(),
+}
+
+
+class InvalidStatusTransition(ValueError):
+    def __init__(self, from_status, to_status):
+        self.from_status = from_status
+        self.to_status = to_status
+        super().__init__(
+            f"Нельзя перевести заказ из статуса «{OrderStatusEnum(from_status).label}» "
+            f"в «{OrderStatusEnum(to_status).label}»"
+        )
+
+
+def can_transition(from_status, to_status):
+    return from_status == to_status or to_status in TRANSITIONS.get(from_status, ())
+
+
+def original_status(order):
+    """Статус заказа в БД, запомненный при загрузке; запрос только если он неизвестен."""
+    status = getattr(order, '_original_status', None)
+    if status is None:
+        status = Order.objects.filter(pk=order.pk).values_list('status', flat=True).first()
+        order._original_status = status
+    return status
+
+
+def deduct_stock(order):
+    order_items = list(order.items.select_related('product', 'size'))
+    inventories = {
+        (inventory.product_id, inventory.size_id): inventory
+        for inventory in ProductSizeInventory.objects.select_for_update().filter(
+            product_id__in={item.product_id for item in order_items},
+            size_id__in={item.size_id for item in order_items},
+        )
+    }
+
+    for item in order_items:
+        inventory = inventories.get((item.product_id, item.size_id))
+        if inventory is None:
+            logger.error(
+                f"Не найден товар на складе для заказа {order.pk}: "
+                f"{item.product.name} ({item.size.name})"
+            )
+            raise ValueError(f"Товар не найден на складе: {item.product.name} ({item.size.name})")
+        if inventory.stock < item.quantity:
+            logger.error(
+                f"Недостаточно товара на складе для заказа {order.pk}: "
+                f"{item.product.name} ({item.size.name}), "
+                f"в наличии {inventory.stock}, требуется {item.quantity}"
+            )
+            raise ValueError(
+                f"Недостаточно товара: {item.product.name} ({item.size.name}), "
+                f"в наличии {inventory.stock}, требуется {item.quantity}"
+            )
+        inventory.stock -= item.quantity
+
+    changed = {
+        (item.product_id, item.size_id): inventories[(item.product_id, item.size_id)]
+        for item in order_items
+    }
+    ProductSizeInventory.objects.bulk_update(changed.values(), ['stock'])
+    # bulk_update не отправляет post_save, поэтому товары заказа пересчитываются одним вызовом
+    sync_product_stock({product_id for product_id, _ in changed})
+
+    remaining = [(inventory.product_id, inventory.size_id, inventory.stock) for inventory in changed.values()]
+    for item in order_items:
+        logger.info(
+            f"Списано {item.quantity} шт. {item.product.name} ({item.size.name}) "
+            f"для заказа {order.pk}, осталось {inventories[(item.product_id, item.size_id)].stock}"
+        )
+
+    record_order_accepted(order, order_items)
+    snapshot_stock(remaining)
+
+
+def apply_transition(order, from_status, to_status):
+    """Проверяет переход и выполняет его побочные эффекты; вызывается из pre_save."""
+    if not can_transition(from_status, to_status):
+        raise InvalidStatusTransition(from_status, to_status)
+    if to_status == OrderStatusEnum.ACCEPTED:
+        deduct_stock(order)
+
+
+def record_transition(order, from_status, to_status, user=None):
+    return OrderStatusEvent.objects.create(order=order, from_status=from_status, to_status=to_status, user=user)
+
+
+def change_order_status(order, to_status, user=None):
+    """Переводит заказ в новый статус под блокировкой строки заказа.
+
+    Статус перечитывается с select_for_update, поэтому параллельное принятие
+    одного заказа не спишет остатки дважды. Возвращает False, если заказ уже
+    в этом статусе.
+    """
+    with transaction.atomic():
+        current = Order.objects.select_for_update().values_list('status', flat=True).get(pk=order.pk)
+        order._original_status = current
+        if current == to_status:
+            order.status = current
+            return False
+        order.status = to_status
+        order._status_changed_by = user
+        order.save(update_fields=['status', 'updated_at'])
+    return True
@@ -0,0 +1,85 @@
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError
+
+from .models import Category, PaymentQR, Size
+from .serializers import CategorySerializer, PaymentQRSerializer, SizeSerializer
+
+
+class ReferenceCache:
+    """Кеш небольших справочных таблиц в памяти процесса.
+
+    Хранит уже сериализованные списки, поэтому попадание в кеш не требует ни
+    запроса, ни сериализации. Каждая запись живёт REFERENCE_CACHE_TTL секунд
+    и сбрасывается сигналами при изменении модели.
+    """
+
+    def __init__(self):
+        self._loaders = {}
+        self._entries = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, model, serializer_class):
+        self._loaders[name] = (model, serializer_class)
+        self._stats[name] = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+    def models(self):
+        return {name: model for name, (model, serializer_class) in self._loaders.items()}
+
+    def get(self, name):
+        entry = self._entries.get(name)
+        if entry is not None and time.monotonic() - entry[0] < settings.REFERENCE_CACHE_TTL:
+            self._stats[name]['hits'] += 1
+            return entry[1]
+
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None and time.monotonic() - entry[0] < settings.REFERENCE_CACHE_TTL:
+                self._stats[name]['hits'] += 1
+                return entry[1]
+            self._stats[name]['misses'] += 1
+            data = self._load(name)
+            self._entries[name] = (time.monotonic(), data)
+            return data
+
+    def _load(self, name):
+        model, serializer_class = self._loaders[name]
+        return list(serializer_class(model.objects.all(), many=True).data)
+
+    def invalidate(self, name=None):
+        names = [name] if name else list(self._loaders)
+        with self._lock:
+            for key in names:
+                if self._entries.pop(key, None) is not None:
+                    self._stats[key]['invalidations'] += 1
+
+    def warm(self):
+        """Загружает все справочники; ошибки БД (например, до миграций) не мешают запуску."""
+        for name in self._loaders:
+            try:
+                self.get(name)
+            except DatabaseError:
+                return False
+        return True
+
+    def stats(self):
+        now = time.monotonic()
+        result = {}
+        for name, counters in self._stats.items():
+            entry = self._entries.get(name)
+            result[name] = {
+                **counters,
+                'cached': entry is not None,
+                'size': len(entry[1]) if entry else 0,
+                'age': round(now - entry[0], 1) if entry else None,
+            }
+        return {'ttl': settings.REFERENCE_CACHE_TTL, 'tables': result}
+
+
+reference_cache = ReferenceCache()
+reference_cache.register('payment_qrs', PaymentQR, PaymentQRSerializer)
+reference_cache.register('sizes', Size, SizeSerializer)
+reference_cache.register('categories', Category, CategorySerializer)
@@ -25,13 +25,22 @@ class BrandListSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'logo', 'is_active')
 
 
-class ProductListSerializer(serializers.ModelSerializer):
+class FavoriteFlagMixin(serializers.Serializer):
+    """is_favorite по множеству id из context['favorite_ids'], без запроса на строку."""
+    is_favorite = serializers.SerializerMethodField()
+
+    def get_is_favorite(self, obj):
+        return obj.id in self.context.get('favorite_ids', ())
+
+
+class ProductListSerializer(FavoriteFlagMixin, serializers.ModelSerializer):
     category = CategorySerializer(read_only=True)
     final_price = serializers.SerializerMethodField()
 
     class Meta:
         model = Product
-        fields = ('id', 'name', 'category', 'price', 'discount_percent', 'final_price', 'main_cover', 'get_status_display')
+        fields = ('id', 'name', 'category', 'price', 'discount_percent', 'final_price', 'main_cover',
+                  'get_status_display', 'is_favorite')
 
     def get_final_price(self, obj):
         return obj.final_price
@@ -57,7 +66,7 @@ class ProductSizeInventorySerializer(serializers.ModelSerializer):
         fields = ('size', 'stock')
 
 
-class ProductDetailSerializer(serializers.ModelSerializer):
+class ProductDetailSerializer(FavoriteFlagMixin, serializers.ModelSerializer):
     category = CategorySerializer(read_only=True)
     final_price = serializers.SerializerMethodField()
     images = ImageSerializer(many=True, read_only=True)
@@ -66,7 +75,7 @@ class ProductDetailSerializer(serializers.ModelSerializer):
     class Meta:
         model = Product
         fields = ('id', 'name', 'category', 'price', 'discount_percent', 'final_price',
-                  'description', 'main_cover', 'images', 'sizes', 'get_status_display')
+                  'description', 'main_cover', 'images', 'sizes', 'get_status_display', 'is_favorite')
 
     def get_final_price(self, obj):
         return obj.final_price  # Вызываем @property
@@ -76,13 +85,13 @@ class ProductDetailSerializer(serializers.ModelSerializer):
         return ProductSizeInventorySerializer(inventory, many=True).data
 
 
-class RelatedProductSerializer(serializers.ModelSerializer):
+class RelatedProductSerializer(FavoriteFlagMixin, serializers.ModelSerializer):
     category = CategorySerializer(read_only=True)
     final_price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
 
     class Meta:
         model = Product
-        fields = ('id', 'name', 'category', 'price', 'final_price', 'main_cover')
+        fields = ('id', 'name', 'category', 'price', 'final_price', 'main_cover', 'is_favorite')
 
 
 class CartItemSerializer(serializers.ModelSerializer):
@@ -100,6 +109,9 @@ class CartItemSerializer(serializers.ModelSerializer):
         fields = ('id', 'product', 'product_details', 'size', 'quantity', 'subtotal')
 
     def validate(self, data):
+        # context['check_stock'] = False: склад проверяет сама запись (add_cart_item)
+        if not self.context.get('check_stock', True):
+            return data
         product = data['product']
         size = data['size']
         quantity = data.get('quantity', 1)
@@ -127,7 +139,29 @@ class CartItemSerializer(serializers.ModelSerializer):
         return (obj.product.final_price * obj.quantity).quantize(Decimal('0.01'))
 
 
-class CartSerializer(serializers.ModelSerializer):
+# Доставка бесплатна от FREE_SHIPPING_FROM, иначе стоит SHIPPING_COST
+FREE_SHIPPING_FROM = Decimal('100.00')
+SHIPPING_COST = Decimal('10.00')
+
+
+class CartTotalsMixin:
+    """Стоимость доставки и итог корзины — общие для корзины пользователя и гостевой."""
+
+    def get_cart_items(self, obj):
+        raise NotImplementedError('.get_cart_items() must be overridden')
+
+    def _items_total(self, obj):
+        return sum(item.product.final_price * item.quantity for item in self.get_cart_items(obj))
+
+    def get_total(self, obj):
+        total = self._items_total(obj)
+        return (total + self.get_shipping_cost(obj)).quantize(Decimal('0.01'))
+
+    def get_shipping_cost(self, obj):
+        return SHIPPING_COST if self._items_total(obj) < FREE_SHIPPING_FROM else Decimal('0.00')
+
+
+class CartSerializer(CartTotalsMixin, serializers.ModelSerializer):
     items = CartItemSerializer(many=True, read_only=True)
     total = serializers.SerializerMethodField()
     shipping_cost = serializers.SerializerMethodField()
@@ -136,14 +170,44 @@ class CartSerializer(serializers.ModelSerializer):
         model = Cart
         fields = ('id', 'user', 'items', 'shipping_cost', 'total')
 
-    def get_total(self, obj):
-        total = sum(item.product.final_price * item.quantity for item in obj.items.all())
-        shipping = self.get_shipping_cost(obj)
-        return (total + shipping).quantize(Decimal('0.01'))
+    def get_cart_items(self, obj):
+        return obj.items.all()
 
-    def get_shipping_cost(self, obj):
-        total = sum(item.product.final_price * item.quantity for item in obj.items.all())
-        return Decimal('10.00') if total < Decimal('100.00') else Decimal('0.00')
+
+class GuestCartSerializer(CartTotalsMixin, serializers.Serializer):
+    token = serializers.CharField()
+    items = CartItemSerializer(many=True)
+    shipping_cost = serializers.SerializerMethodField()
+    total = serializers.SerializerMethodField()
+
+    def get_cart_items(self, obj):
+        return obj['items']
+
+
+class CartBulkItemSerializer(serializers.Serializer):
+    product = serializers.IntegerField(min_value=1)
+    size = serializers.CharField(max_length=10)
+    quantity = serializers.IntegerField(min_value=0)
+
+
+class CartBulkSerializer(serializers.Serializer):
+    items = CartBulkItemSerializer(many=True, allow_empty=False, max_length=100)
+
+    def validate_items(self, items):
+        keys = [(item['product'], item['size']) for item in items]
+        if len(keys) != len(set(keys)):
+            raise serializers.ValidationError("Товар с одним и тем же размером указан несколько раз.")
+        return items
+
+
+class FavoriteSyncSerializer(serializers.Serializer):
+    add = serializers.ListField(child=serializers.IntegerField(min_value=1), max_length=500, default=list)
+    remove = serializers.ListField(child=serializers.IntegerField(min_value=1), max_length=500, default=list)
+
+    def validate(self, data):
+        if set(data['add']) & set(data['remove']):
+            raise serializers.ValidationError("Товар не может быть одновременно добавлен и удалён.")
+        return data
 
 
 class FavoriteSerializer(serializers.ModelSerializer):
@@ -154,10 +218,11 @@ class FavoriteSerializer(serializers.ModelSerializer):
         fields = ('id', 'product', 'created_at')
 
     def get_product(self, obj):
+        category = obj.product.category
         return {
             'id': obj.product.id,
             'name': obj.product.name,
-            'category': CategorySerializer(obj.product.category).data,
+            'category': {'id': category.id, 'name': category.name},
             'main_cover': obj.product.main_cover.url,
             'final_price': obj.product.final_price
         }
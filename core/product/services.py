@@ -0,0 +1,130 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, F, OuterRef
+from rest_framework import serializers
+
+from .models import CartItem, ProductSizeInventory
+
+
+class InsufficientStockError(Exception):
+    def __init__(self, stock):
+        self.stock = stock
+        super().__init__(f"Недостаточно товара. В наличии: {stock or 0} шт.")
+
+
+def _stock_at_least(product_id, size, quantity):
+    return Exists(ProductSizeInventory.objects.filter(product_id=product_id, size=size, stock__gte=quantity))
+
+
+def _current_stock(product_id, size):
+    return ProductSizeInventory.objects.filter(
+        product_id=product_id, size=size
+    ).values_list('stock', flat=True).first()
+
+
+def add_cart_item(cart, product, size, quantity):
+    """Атомарно увеличивает количество товара в корзине.
+
+    Инкремент выполняется одним UPDATE с F-выражением, а проверка склада
+    стоит в том же запросе, поэтому параллельные добавления не теряются
+    и не превышают остаток. Новая строка вставляется только после проверки
+    заблокированного остатка.
+    """
+    items = CartItem.objects.filter(cart=cart, product=product, size=size)
+    guard = _stock_at_least(product.id, size, OuterRef('quantity') + quantity)
+
+    if items.filter(guard).update(quantity=F('quantity') + quantity):
+        return
+    try:
+        with transaction.atomic():
+            # Строки ещё нет: блокируем остаток, чтобы проверка склада и вставка
+            # не разошлись с параллельным списанием
+            stock = ProductSizeInventory.objects.select_for_update().filter(
+                product_id=product.id, size=size
+            ).values_list('stock', flat=True).first()
+            if (stock or 0) < quantity:
+                raise InsufficientStockError(stock)
+            CartItem.objects.create(cart=cart, product=product, size=size, quantity=quantity)
+        return
+    except IntegrityError:
+        # Строку уже создал параллельный запрос, повторяем инкремент
+        pass
+    if items.filter(guard).update(quantity=F('quantity') + quantity):
+        return
+    raise InsufficientStockError(_current_stock(product.id, size))
+
+
+def update_cart_item(cart_item, size, quantity):
+    """Задаёт размер и количество строки корзины, если склад это позволяет."""
+    updated = CartItem.objects.filter(id=cart_item.id).filter(
+        _stock_at_least(cart_item.product_id, size, quantity)
+    ).update(size=size, quantity=quantity)
+    if not updated:
+        raise InsufficientStockError(_current_stock(cart_item.product_id, size))
+    cart_item.size = size
+    cart_item.quantity = quantity
+
+
+def apply_cart_lines(cart, lines):
+    """Применяет к корзине набор строк {product, size, quantity}.
+
+    quantity задаёт итоговое количество (upsert), 0 удаляет строку. Все строки
+    проверяются по складу одним запросом и применяются в одной транзакции.
+    """
+    product_ids = {line['product'] for line in lines}
+    size_names = {line['size'] for line in lines}
+
+    inventory = {
+        (row.product_id, row.size.name): row
+        for row in ProductSizeInventory.objects.filter(
+            product_id__in=product_ids,
+            product__is_active=True,
+            size__name__in=size_names,
+        ).select_related('size')
+    }
+
+    errors = []
+    for line in lines:
+        row = inventory.get((line['product'], line['size']))
+        if line['quantity'] == 0:
+            errors.append({})
+        elif row is None:
+            errors.append({"size": "Выбранный размер недоступен для этого товара."})
+        elif line['quantity'] > row.stock:
+            errors.append({"quantity": f"Недостаточно товара. В наличии: {row.stock} шт."})
+        else:
+            errors.append({})
+    if any(errors):
+        raise serializers.ValidationError({"items": errors})
+
+    with transaction.atomic():
+        existing = {
+            (item.product_id, item.size.name): item
+            for item in CartItem.objects.select_for_update().filter(
+                cart=cart, product_id__in=product_ids, size__name__in=size_names
+            ).select_related('size')
+        }
+
+        to_create, to_update, to_delete = [], [], []
+        for line in lines:
+            key = (line['product'], line['size'])
+            item = existing.get(key)
+            if line['quantity'] == 0:
+                if item is not None:
+                    to_delete.append(item.id)
+            elif item is None:
+                to_create.append(CartItem(
+                    cart=cart,
+                    product_id=line['product'],
+                    size=inventory[key].size,
+                    quantity=line['quantity'],
+                ))
+            elif item.quantity != line['quantity']:
+                item.quantity = line['quantity']
+                to_update.append(item)
+
+        if to_delete:
+            CartItem.objects.filter(id__in=to_delete).delete()
+        if to_update:
+            CartItem.objects.bulk_update(to_update, ['quantity'])
+        if to_create:
+            CartItem.objects.bulk_create(to_create)
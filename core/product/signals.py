@@ -1,62 +1,70 @@
-from django.db.models.signals import pre_save
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
 from django.db import transaction
-from .models import Order, OrderStatusEnum, ProductSizeInventory
+from .analytics import snapshot_stock
+from .models import Order, ProductSizeInventory
+from .order_status import original_status, apply_transition, record_transition
+from .reference_cache import reference_cache
+from .stock import sync_product_stock
 import logging
 
 logger = logging.getLogger(__name__)
 
 
 @receiver(pre_save, sender=Order)
-def handle_order_status_change(sender, instance, **kwargs):
-    if instance.pk is None:
+def handle_order_status_change(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._status_transition = None
+    if raw or instance._state.adding:
+        return
+    if update_fields is not None and 'status' not in update_fields:
+        return
+
+    previous = original_status(instance)
+    if previous is None or previous == instance.status:
         return
 
     try:
-        old_order = Order.objects.get(pk=instance.pk)
-
-        if old_order.status == instance.status or old_order.status == OrderStatusEnum.ACCEPTED:
-            return
-
-        if instance.status == OrderStatusEnum.ACCEPTED and old_order.status != OrderStatusEnum.ACCEPTED:
-            with transaction.atomic():
-                order_items = instance.items.select_related('product', 'size').all()
-
-                for item in order_items:
-                    try:
-                        inventory = ProductSizeInventory.objects.select_for_update().get(
-                            product=item.product, size=item.size
-                        )
-
-                        if inventory.stock < item.quantity:
-                            logger.error(
-                                f"Недостаточно товара на складе для заказа {instance.pk}: "
-                                f"{item.product.name} ({item.size.name}), "
-                                f"в наличии {inventory.stock}, требуется {item.quantity}"
-                            )
-                            raise ValueError(
-                                f"Недостаточно товара: {item.product.name} ({item.size.name}), "
-                                f"в наличии {inventory.stock}, требуется {item.quantity}"
-                            )
-                    except ProductSizeInventory.DoesNotExist:
-                        logger.error(
-                            f"Не найден товар на складе для заказа {instance.pk}: "
-                            f"{item.product.name} ({item.size.name})"
-                        )
-                        raise ValueError(
-                            f"Товар не найден на складе: {item.product.name} ({item.size.name})"
-                        )
-
-                for item in order_items:
-                    inventory = ProductSizeInventory.objects.select_for_update().get(
-                        product=item.product, size=item.size
-                    )
-                    inventory.stock -= item.quantity
-                    inventory.save()
-                    logger.info(
-                        f"Списано {item.quantity} шт. {item.product.name} ({item.size.name}) "
-                        f"для заказа {instance.pk}, осталось {inventory.stock}"
-                    )
+        with transaction.atomic():
+            apply_transition(instance, previous, instance.status)
     except Exception as e:
         logger.error(f"Ошибка при обработке изменения статуса заказа {instance.pk}: {str(e)}")
         raise
+    instance._status_transition = (previous, instance.status)
+
+
+@receiver(post_save, sender=Order)
+def log_order_status_change(sender, instance, raw=False, update_fields=None, **kwargs):
+    transition = getattr(instance, '_status_transition', None)
+    if transition:
+        record_transition(instance, *transition, user=getattr(instance, '_status_changed_by', None))
+        instance._status_transition = None
+        instance._status_changed_by = None
+    if update_fields is None or 'status' in update_fields:
+        instance._original_status = instance.status
+
+
+@receiver(post_save, sender=ProductSizeInventory)
+@receiver(post_delete, sender=ProductSizeInventory)
+def handle_inventory_change(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    sync_product_stock([instance.product_id])
+
+
+@receiver(post_save, sender=ProductSizeInventory)
+def snapshot_inventory_change(sender, instance, raw=False, **kwargs):
+    # Пополнение из админки должно попасть в дневной снимок для панели аналитики
+    if raw:
+        return
+    snapshot_stock([(instance.product_id, instance.size_id, instance.stock)])
+
+
+def invalidate_reference_cache(sender, **kwargs):
+    for name, model in reference_cache.models().items():
+        if model is sender:
+            reference_cache.invalidate(name)
+
+
+for model in reference_cache.models().values():
+    post_save.connect(invalidate_reference_cache, sender=model, dispatch_uid=f'reference_cache_{model._meta.label}')
+    post_delete.connect(invalidate_reference_cache, sender=model, dispatch_uid=f'reference_cache_{model._meta.label}')
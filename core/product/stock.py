@@ -0,0 +1,71 @@
+import logging
+
+from django.conf import settings
+from django.db.models import Case, Exists, F, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.dispatch import Signal
+
+from .choices import ProductStatusEnum
+from .models import Product, ProductSizeInventory
+
+
+logger = logging.getLogger('product.stock')
+
+# Отправляется при падении общего остатка товара ниже LOW_STOCK_THRESHOLD
+# и при переходе товара в "Нет в наличии"; аргументы: product, previous_stock, stock
+low_stock = Signal()
+
+
+def _inventory_total():
+    return Coalesce(Subquery(
+        ProductSizeInventory.objects.filter(product_id=OuterRef('pk'))
+        .order_by()
+        .values('product_id')
+        .annotate(total=Sum('stock'))
+        .values('total')
+    ), 0)
+
+
+def _synced_status():
+    in_stock = Exists(ProductSizeInventory.objects.filter(product_id=OuterRef('pk'), stock__gt=0))
+    # "Нет в наличии" без остатков и обратно; "Скоро в продаже" выставляется
+    # вручную и не зависит от остатков
+    return Case(
+        When(~in_stock, status=ProductStatusEnum.ON_SALE, then=Value(ProductStatusEnum.OUT_OF_STOCK)),
+        When(in_stock, status=ProductStatusEnum.OUT_OF_STOCK, then=Value(ProductStatusEnum.ON_SALE)),
+        default=F('status'),
+    )
+
+
+def sync_product_stock(product_ids):
+    """Пересчитывает total_stock и статус только для переданных товаров.
+
+    Вызывается при изменении их строк ProductSizeInventory, поэтому полный
+    обход таблицы не нужен. Пересчёт — один UPDATE с подзапросом по остаткам;
+    в память читаются только товары, пересекающие порог low_stock.
+    Возвращает число изменённых товаров.
+    """
+    product_ids = set(product_ids)
+    if not product_ids:
+        return 0
+
+    threshold = settings.LOW_STOCK_THRESHOLD
+    products = Product.objects.filter(id__in=product_ids).annotate(
+        new_total=_inventory_total(), new_status=_synced_status()
+    )
+    crossing = list(products.filter(
+        Q(total_stock__gte=threshold, new_total__lt=threshold) | Q(total_stock__gt=0, new_total=0)
+    ).only('id', 'name', 'status', 'total_stock'))
+
+    changed = products.exclude(total_stock=F('new_total'), status=F('new_status')).update(
+        total_stock=_inventory_total(), status=_synced_status()
+    )
+
+    for product in crossing:
+        previous, product.total_stock = product.total_stock, product.new_total
+        if product.new_status != product.status:
+            logger.info(f"Статус товара {product.name} (id={product.id}): {product.status} -> {product.new_status}")
+            product.status = product.new_status
+        logger.warning(f"Заканчивается товар {product.name} (id={product.id}): осталось {product.total_stock} шт.")
+        low_stock.send(sender=Product, product=product, previous_stock=previous, stock=product.total_stock)
+    return changed
@@ -0,0 +1,8 @@
+class Echo:
+    """Псевдо-файл для csv.writer: writerow возвращает готовую строку вместо записи.
+
+    Позволяет отдавать CSV построчно генератором — в файл или StreamingHttpResponse.
+    """
+
+    def write(self, value):
+        return value
@@ -1,3 +1,847 @@
-from django.test import TestCase
+import csv
+import hashlib
+import io
+import json
+import shutil
+import tempfile
+import threading
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.redis import RedisCache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, connections, router
+from django.db.models.query import QuerySet, ValuesListIterable
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core import db_router
+from core.schema import precomputed_schema
+from core.throttling import TOKEN_BUCKET_SCRIPT, TokenBucketStore, throttle_metrics
+from core.db_router import ReplicaRouter, replica_reads, is_pinned_to_primary
+from .analytics import rebuild_sales_rollups
+from .choices import OrderStatusEnum
+from .models import (
+    Category, Product, Size, ProductSizeInventory, Cart, CartItem, Favorite,
+    Order, OrderItem, OrderStatusEvent, DailySales, DailyProductSales, StockSnapshot,
+)
+from .favorites import add_favorite, favorite_ids, remove_favorite
+from .reference_cache import reference_cache
+from .order_status import InvalidStatusTransition, change_order_status
+from .services import add_cart_item, InsufficientStockError
+from . import order_export
+from .catalog_import import CatalogImportError, import_catalog
+from .inventory_io import import_inventory, read_rows
+from .management.commands.profile_startup import parse_importtime
+from .stock import low_stock, sync_product_stock
+
+
+User = get_user_model()
+
+
+class ShopFixturesMixin:
+    @classmethod
+    def create_fixtures(cls):
+        cls.user = User.objects.create_user(
+            email='buyer@example.com', phone_number='0555000000', username='buyer', password='secret-pass'
+        )
+        cls.category = Category.objects.create(name='Кепки')
+        cls.product = Product.objects.create(
+            category=cls.category, name='Кепка', description='Описание',
+            main_cover='products/main_cover/cap.jpg', price=100
+        )
+        cls.size = Size.objects.create(name='M')
+        cls.inventory = ProductSizeInventory.objects.create(product=cls.product, size=cls.size, stock=10)
+
+    def setUp(self):
+        cache.clear()
+        caches['primary_pins'].clear()
+        caches['favorites'].clear()
+        reference_cache.invalidate()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+
+class ShopTestCase(ShopFixturesMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.create_fixtures()
+
+
+REPLICA_DATABASES = {
+    'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': 'primary.sqlite3'},
+    'replica1': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': 'replica.sqlite3'},
+}
+
+
+class ReplicaRouterTests(ShopFixturesMixin, TransactionTestCase):
+    # Реплики в тестах зеркалируют default отдельным соединением, поэтому
+    # данные должны быть закоммичены: TestCase держит их в открытой транзакции
+    databases = '__all__'
+
+    def setUp(self):
+        self.create_fixtures()
+        super().setUp()
+
+    def test_routes_reads_to_replica_only_inside_replica_context(self):
+        with override_settings(DATABASES=REPLICA_DATABASES):
+            router = ReplicaRouter()
+
+        self.assertEqual(router.db_for_read(Product), 'default')
+        with replica_reads():
+            self.assertEqual(router.db_for_read(Product), 'replica1')
+            self.assertEqual(router.db_for_write(Product), 'default')
+        self.assertEqual(router.db_for_read(Product), 'default')
+
+    def test_replica_alias_reads_rows_written_on_primary(self):
+        # Отдельное соединение к той же тестовой БД играет роль реплики
+        connections.settings['replica1'] = dict(connections['default'].settings_dict)
+        self.addCleanup(connections.settings.pop, 'replica1')
+        self.addCleanup(connections.__delitem__, 'replica1')
+        self.addCleanup(lambda: connections['replica1'].close())
+        replica_router = next(r for r in router.routers if isinstance(r, ReplicaRouter))
+
+        with mock.patch.object(replica_router, 'replicas', ['replica1']), \
+                mock.patch.object(type(self), 'databases', self.databases | {'replica1'}):
+            product = Product.objects.create(
+                category=self.category, name='Панама', description='Описание',
+                main_cover='products/main_cover/hat.jpg', price=200
+            )
+            self.assertEqual(product._state.db, 'default')
+            with replica_reads():
+                replica_product = Product.objects.get(pk=product.pk)
+
+        self.assertEqual(replica_product._state.db, 'replica1')
+        self.assertEqual(replica_product.name, 'Панама')
+
+    def test_catalog_reads_use_replica_until_user_writes(self):
+        states = []
+        original = ReplicaRouter.db_for_read
+
+        def record(router, model, **hints):
+            if model is Product:
+                states.append(db_router._replica_reads.get())
+            return original(router, model, **hints)
+
+        with mock.patch.object(ReplicaRouter, 'db_for_read', autospec=True, side_effect=record):
+            self.client.get(reverse('product_list'))
+            self.assertTrue(states and all(states))
+
+            response = self.client.post(reverse('favorite_toggle', args=[self.product.id]))
+            self.assertEqual(response.status_code, 201)
+            self.assertTrue(is_pinned_to_primary(self.user))
+
+            states.clear()
+            self.client.get(reverse('product_list'))
+            self.assertTrue(states and not any(states))
+
+
+class CartAddTests(ShopTestCase):
+    def test_stock_is_checked_only_by_the_guarded_write(self):
+        cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=cart, product=self.product, size=self.size, quantity=1)
+        url = reverse('cart')
+        payload = {'product': self.product.id, 'size': 'M', 'quantity': 3}
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.post(url, payload, format='json').status_code, 201)
+        self.assertFalse([
+            q for q in queries if q['sql'].startswith('SELECT') and 'FROM "product_productsizeinventory"' in q['sql']
+        ])
+
+        response = self.client.post(url, {**payload, 'quantity': 7}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, {'error': 'Недостаточно товара. В наличии: 10 шт.'})
+        self.assertEqual(CartItem.objects.get().quantity, 4)
+
+
+class CartBulkTests(ShopTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.size_l = Size.objects.create(name='L')
+        ProductSizeInventory.objects.create(product=cls.product, size=cls.size_l, stock=3)
+
+    def test_upserts_and_deletes_lines_in_one_request(self):
+        cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=cart, product=self.product, size=self.size_l, quantity=1)
+
+        response = self.client.post(reverse('cart_bulk'), {'items': [
+            {'product': self.product.id, 'size': 'M', 'quantity': 4},
+            {'product': self.product.id, 'size': 'L', 'quantity': 0},
+        ]}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            list(cart.items.values_list('size__name', 'quantity')), [('M', 4)]
+        )
+
+    def test_rejects_whole_batch_when_one_line_exceeds_stock(self):
+        response = self.client.post(reverse('cart_bulk'), {'items': [
+            {'product': self.product.id, 'size': 'M', 'quantity': 1},
+            {'product': self.product.id, 'size': 'L', 'quantity': 5},
+        ]}, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('quantity', response.data['items'][1])
+        self.assertFalse(CartItem.objects.exists())
+
+
+class GuestCartTests(ShopTestCase):
+    def test_guest_cart_is_merged_into_user_cart_on_login(self):
+        anonymous = APIClient()
+        response = anonymous.post(reverse('guest_cart'), {
+            'product': self.product.id, 'size': 'M', 'quantity': 2
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        token = response.data['token']
+
+        response = anonymous.post(reverse('guest_cart'), {
+            'product': self.product.id, 'size': 'M', 'quantity': 1
+        }, format='json', HTTP_X_GUEST_CART=token)
+        self.assertEqual(response.data['items'][0]['quantity'], 3)
+        self.assertEqual((response.data['shipping_cost'], response.data['total']), (Decimal('0.00'), Decimal('300.00')))
+
+        cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=cart, product=self.product, size=self.size, quantity=1)
+
+        response = anonymous.post(reverse('token_obtain_pair'), {
+            'email': 'buyer@example.com', 'password': 'secret-pass', 'guest_cart_token': token
+        }, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(CartItem.objects.get(cart=cart).quantity, 4)
+        self.assertEqual(
+            anonymous.get(reverse('guest_cart'), HTTP_X_GUEST_CART=token).status_code, 404
+        )
+
+
+class AdminChangelistQueryTests(ShopTestCase):
+    def setUp(self):
+        super().setUp()
+        admin_user = User.objects.create_superuser(
+            email='admin@example.com', phone_number='0555000001', username='admin', password='admin-pass'
+        )
+        self.client.force_login(admin_user)
+
+    def add_rows(self, start, count):
+        for i in range(start, start + count):
+            user = User.objects.create_user(
+                email=f'user{i}@example.com', phone_number='0555000000', username=f'user{i}', password=None
+            )
+            category = Category.objects.create(name=f'Категория {i}')
+            product = Product.objects.create(
+                category=category, name=f'Товар {i}', description='Описание',
+                main_cover='products/main_cover/cap.jpg', price=100
+            )
+            ProductSizeInventory.objects.create(product=product, size=self.size, stock=i)
+            cart = Cart.objects.create(user=user)
+            CartItem.objects.create(cart=cart, product=product, size=self.size, quantity=1)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def test_changelists_render_in_constant_number_of_queries(self):
+        urls = [
+            reverse('admin:product_product_changelist'),
+            reverse('admin:product_category_changelist'),
+            reverse('admin:product_cart_changelist'),
+            reverse('admin:product_cartitem_changelist'),
+            reverse('admin:product_productsizeinventory_changelist'),
+            reverse('admin:product_image_changelist'),
+        ]
+        self.add_rows(0, 2)
+        small = [self.count_queries(url) for url in urls]
+        self.add_rows(2, 20)
+        large = [self.count_queries(url) for url in urls]
+
+        self.assertEqual(small, large)
+
+    def test_autocomplete_filter_applies_selected_object(self):
+        self.add_rows(0, 3)
+        cart = Cart.objects.get(user__username='user1')
+
+        response = self.client.get(
+            reverse('admin:product_cartitem_changelist'), {'cart__id__exact': cart.id}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.context['cl'].result_list), list(cart.items.all()))
+        self.assertContains(response, 'admin-autocomplete')
+
+
+class InventoryImportTests(ShopTestCase):
+    def test_upserts_valid_rows_and_reports_invalid_ones(self):
+        Size.objects.create(name='L')
+        data = io.StringIO(
+            'product_id,size,stock\n'
+            f'{self.product.id},M,7\n'
+            f'{self.product.id},L,3\n'
+            f'{self.product.id},XXL,1\n'
+            '999999,M,1\n'
+        )
+        changes = []
+
+        report = import_inventory(read_rows(data, 'csv'), batch_size=2, on_change=lambda *c: changes.append(c))
+
+        self.assertEqual((report.created, report.updated, report.invalid), (1, 1, 2))
+        self.assertEqual(
+            dict(self.product.inventory.values_list('size__name', 'stock')), {'M': 7, 'L': 3}
+        )
+        self.assertIn((self.product.id, 'M', 10, 7), changes)
+
+    def test_export_command_writes_to_command_stdout(self):
+        out = io.StringIO()
+        call_command('export_inventory', stdout=out)
+
+        rows = list(csv.reader(io.StringIO(out.getvalue())))
+        self.assertEqual(rows, [['product_id', 'size', 'stock'], [str(self.product.id), 'M', '10']])
+
+    def test_command_reports_malformed_jsonl_line(self):
+        path = Path(self.enterContext(tempfile.TemporaryDirectory())) / 'stock.jsonl'
+        path.write_text(
+            json.dumps({'product_id': self.product.id, 'size': 'M', 'stock': 7}) + '\n'
+            '{"product_id": \n',
+            encoding='utf-8',
+        )
+
+        with self.assertRaisesMessage(CommandError, 'Строка 2: некорректный JSON'):
+            call_command('import_inventory', str(path), stdout=io.StringIO())
+
+        self.inventory.refresh_from_db()
+        self.assertEqual(self.inventory.stock, 10)
+
+    def test_admin_reports_malformed_jsonl_upload(self):
+        admin_user = User.objects.create_superuser(
+            email='admin@example.com', phone_number='0555000001', username='admin', password='admin-pass'
+        )
+        self.client.force_login(admin_user)
+        upload = SimpleUploadedFile('stock.jsonl', b'{"product_id": \n')
+
+        response = self.client.post(
+            reverse('admin:product_inventory_import'), {'file': upload, 'format': 'jsonl'}, follow=True
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Строка 1: некорректный JSON', [str(m) for m in response.context['messages']][0])
+
+
+class CatalogImportTests(ShopTestCase):
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.images_dir = Path(self.enterContext(tempfile.TemporaryDirectory()))
+        (self.images_dir / 'cover.jpg').write_bytes(b'cover')
+        (self.images_dir / 'detail.jpg').write_bytes(b'detail')
+
+    def entry(self, **values):
+        return {
+            'sku': 'CAP-1', 'name': 'Кепка из каталога', 'category': 'Кепки', 'price': '150',
+            'main_cover': 'cover.jpg', 'images': ['detail.jpg'], 'inventory': {'M': 4},
+            **values,
+        }
+
+    def test_rerun_is_idempotent_and_skips_unchanged_files(self):
+        first = import_catalog([self.entry()], self.images_dir)
+        self.assertEqual((first.products_created, first.images_created, first.files_copied), (1, 1, 2))
+
+        second = import_catalog([self.entry()], self.images_dir)
+
+        self.assertEqual(
+            (second.products_created, second.products_updated, second.images_created),
+            (0, 0, 0),
+        )
+        self.assertEqual((second.files_copied, second.files_skipped), (0, 2))
+        self.assertEqual(second.inventory.unchanged, 1)
+        product = Product.objects.get(sku='CAP-1')
+        self.assertEqual(product.images.count(), 1)
+        self.assertEqual(product.inventory.get().stock, 4)
+
+    def test_rejects_duplicate_sku_with_row_number(self):
+        entries = [self.entry(), self.entry(name='Другая кепка')]
+
+        with self.assertRaisesMessage(CatalogImportError, 'Запись 2: артикул CAP-1 уже указан в записи 1'):
+            import_catalog(entries, self.images_dir)
+
+        self.assertFalse(Product.objects.filter(sku='CAP-1').exists())
+
+
+class SalesRollupTests(ShopTestCase):
+    def create_order(self, quantity):
+        order = Order.objects.create(user=self.user, total=100 * quantity)
+        OrderItem.objects.create(order=order, product=self.product, size=self.size, quantity=quantity, price=100)
+        return order
+
+    def accept(self, order):
+        order.status = OrderStatusEnum.ACCEPTED
+        order.save()
+
+    def test_accepting_orders_updates_rollups_incrementally(self):
+        self.accept(self.create_order(2))
+        self.accept(self.create_order(3))
+        self.create_order(4)
+
+        daily = DailySales.objects.get()
+        self.assertEqual((daily.orders_count, daily.units, daily.revenue), (2, 5, 500))
+        self.assertEqual(DailyProductSales.objects.get().units, 5)
+        self.assertEqual(StockSnapshot.objects.get(product=self.product, size=self.size).stock, 5)
+
+        rebuild_sales_rollups()
+        rebuilt = DailySales.objects.get()
+        self.assertEqual((rebuilt.orders_count, rebuilt.units, rebuilt.revenue), (2, 5, 500))
+
+    def test_dashboard_low_stock_keeps_rows_untouched_by_orders(self):
+        size_l = Size.objects.create(name='L')
+        ProductSizeInventory.objects.create(product=self.product, size=size_l, stock=2)
+        StockSnapshot.objects.all().delete()
+        self.accept(self.create_order(6))
+
+        admin_user = User.objects.create_superuser(
+            email='admin@example.com', phone_number='0555000001', username='admin', password='admin-pass'
+        )
+        self.client.force_login(admin_user)
+        response = self.client.get(reverse('admin:product_sales_dashboard'))
+
+        self.assertEqual(
+            sorted((row.size.name, row.stock) for row in response.context['low_stock']), [('L', 2), ('M', 4)]
+        )
+
+        restocked = ProductSizeInventory.objects.get(size=size_l)
+        restocked.stock = 20
+        restocked.save()
+        response = self.client.get(reverse('admin:product_sales_dashboard'))
+        self.assertEqual([(row.size.name, row.stock) for row in response.context['low_stock']], [('M', 4)])
+
+
+class StockSyncTests(ShopTestCase):
+    def test_inventory_changes_sync_status_and_emit_low_stock(self):
+        events = []
+        handler = lambda sender, product, previous_stock, stock, **kwargs: events.append((previous_stock, stock))
+        low_stock.connect(handler)
+        self.addCleanup(low_stock.disconnect, handler)
+
+        self.inventory.stock = 3
+        self.inventory.save()
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.total_stock, self.product.status), (3, 'on_sale'))
+
+        self.inventory.stock = 0
+        self.inventory.save()
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.total_stock, self.product.status), (0, 'out_of_stock'))
+
+        import_inventory([{'product_id': self.product.id, 'size': 'M', 'stock': 8}])
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.total_stock, self.product.status), (8, 'on_sale'))
+        self.assertEqual(events, [(10, 3), (3, 0)])
+
+    def test_sync_is_one_read_and_one_update_for_a_batch(self):
+        others = Product.objects.bulk_create([
+            Product(category=self.category, name=f'Кепка {i}', description='Описание',
+                    main_cover='products/main_cover/cap.jpg', price=100)
+            for i in range(3)
+        ])
+        ProductSizeInventory.objects.bulk_create(
+            [ProductSizeInventory(product=product, size=self.size, stock=7) for product in others]
+        )
+
+        with CaptureQueriesContext(connection) as queries:
+            changed = sync_product_stock([product.id for product in others] + [self.product.id])
+
+        self.assertEqual(changed, 3)
+        self.assertEqual(len(queries), 2)
+        self.assertEqual(
+            set(Product.objects.filter(pk__in=[p.pk for p in others]).values_list('total_stock', flat=True)), {7}
+        )
+
+
+class ReceiptUploadTests(ShopTestCase):
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def upload(self, order, content, name='receipt.png'):
+        url = reverse('order_receipt_upload', args=[order.id])
+        return self.client.post(url, {'receipt': SimpleUploadedFile(name, content)}, format='multipart')
+
+    def test_receipt_is_sniffed_and_stored_by_content_hash(self):
+        order = Order.objects.create(user=self.user, total=100)
+        response = self.upload(order, b'GIF89a fake image')
+        self.assertEqual(response.status_code, 400)
+
+        content = b'\x89PNG\r\n\x1a\n' + b'0' * 100
+        response = self.upload(order, content, name='photo.jpg')
+        self.assertEqual(response.status_code, 200)
+        order.refresh_from_db()
+        digest = hashlib.sha256(content).hexdigest()
+        self.assertEqual(order.receipt_hash, digest)
+        self.assertEqual(order.receipt.name, f'orders/receipts/{digest[:2]}/{digest}.png')
+        self.assertTrue(is_pinned_to_primary(self.user))
+
+        other = Order.objects.create(user=self.user, total=100)
+        response = self.upload(other, content)
+        self.assertEqual(response.status_code, 400)
+
+
+class PrecomputedSchemaTests(TestCase):
+    def test_schema_is_built_once_and_served_with_etag(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        path = Path(directory) / 'schema.yaml'
+        with override_settings(OPENAPI_SCHEMA_FILE=path):
+            request = RequestFactory().get('/api/schema/')
+            self.assertEqual(precomputed_schema(request).status_code, 503)
+
+            call_command('build_openapi_schema', stdout=io.StringIO(), stderr=io.StringIO())
+            response = precomputed_schema(request)
+            self.assertEqual(response.status_code, 200)
+            self.assertIn(b'/api/products/orders/', response.content)
+
+            cached = precomputed_schema(RequestFactory().get('/api/schema/', HTTP_IF_NONE_MATCH=response['ETag']))
+            self.assertEqual(cached.status_code, 304)
+
+
+class StartupProfileTests(TestCase):
+    def test_importtime_output_is_parsed(self):
+        stderr = (
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       120 |        120 |     rest_framework.settings\n"
+            "import time:      2400 |       2520 |   rest_framework\n"
+            "Traceback line that is not an importtime record\n"
+        )
+        self.assertEqual(parse_importtime(stderr), [
+            ('rest_framework.settings', 120, 120),
+            ('rest_framework', 2400, 2520),
+        ])
+
+
+class ThrottlingTests(ShopTestCase):
+    def setUp(self):
+        super().setUp()
+        caches['throttle'].clear()
+
+    @override_settings(REST_FRAMEWORK={
+        **settings.REST_FRAMEWORK,
+        'DEFAULT_THROTTLE_RATES': {**settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'], 'popular_products': '2/min'},
+    })
+    def test_scoped_token_bucket_limits_expensive_requests(self):
+        url = reverse('product_list')
+        statuses = [self.client.get(url, {'sort': 'popular'}).status_code for _ in range(3)]
+        self.assertEqual(statuses, [200, 200, 429])
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+        metrics = throttle_metrics()['scopes']['popular_products']
+        self.assertEqual(metrics, {'allowed': 2, 'throttled': 1})
+
+    @override_settings(REST_FRAMEWORK={
+        **settings.REST_FRAMEWORK,
+        'DEFAULT_THROTTLE_RATES': {**settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'], 'user': '2/min'},
+    })
+    def test_user_bucket_is_per_user(self):
+        url = reverse('category_list')
+        statuses = [self.client.get(url).status_code for _ in range(3)]
+        self.assertEqual(statuses, [200, 200, 429])
+
+        other = User.objects.create_user(
+            email='other@example.com', phone_number='0555000001', username='other', password='secret-pass'
+        )
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    @override_settings(REST_FRAMEWORK={
+        **settings.REST_FRAMEWORK,
+        'DEFAULT_THROTTLE_RATES': {**settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'], 'anon': '2/min'},
+    })
+    def test_anon_bucket_ignores_spoofed_forwarded_for(self):
+        client = APIClient()
+        url = reverse('guest_cart')
+        throttled = [
+            client.get(url, HTTP_X_FORWARDED_FOR=f'10.0.0.{n}').status_code == 429 for n in range(3)
+        ]
+        self.assertEqual(throttled, [False, False, True])
+        self.assertNotEqual(client.get(url, REMOTE_ADDR='192.0.2.1').status_code, 429)
+
+    @override_settings(REST_FRAMEWORK={
+        **settings.REST_FRAMEWORK,
+        'DEFAULT_THROTTLE_RATES': {**settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'], 'anon': '1/min'},
+        'NUM_PROXIES': 1,
+    })
+    def test_anon_bucket_uses_address_added_by_trusted_proxy(self):
+        client = APIClient()
+        url = reverse('guest_cart')
+        self.assertNotEqual(client.get(url, HTTP_X_FORWARDED_FOR='1.1.1.1, 192.0.2.1').status_code, 429)
+        self.assertEqual(client.get(url, HTTP_X_FORWARDED_FOR='2.2.2.2, 192.0.2.1').status_code, 429)
+        self.assertNotEqual(client.get(url, HTTP_X_FORWARDED_FOR='192.0.2.2').status_code, 429)
+
+    def test_redis_store_consumes_through_lua_script(self):
+        redis_cache = RedisCache('redis://localhost:6379/0', {})
+        client = redis_cache.__dict__['_cache'] = mock.Mock()
+        redis_client = client.get_client.return_value
+        script = redis_client.register_script.return_value
+        script.side_effect = [[1, '1.5'], [0, '0.25']]
+        redis_store = TokenBucketStore('throttle')
+
+        with mock.patch.object(TokenBucketStore, 'cache', new_callable=mock.PropertyMock, return_value=redis_cache):
+            self.assertEqual(redis_store.consume('bucket', 3, 60), (True, 0))
+            allowed, wait = redis_store.consume('bucket', 3, 60)
+
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(wait, 15)
+        redis_client.register_script.assert_called_once_with(TOKEN_BUCKET_SCRIPT)
+        script.assert_called_with(keys=[redis_cache.make_key('bucket')], args=[3, 0.05, 60], client=redis_client)
+
+
+class FavoriteFlagTests(ShopTestCase):
+    def test_listings_flag_favorites_from_cached_id_set(self):
+        other = Product.objects.create(
+            category=self.category, name='Панама', description='Описание',
+            main_cover='products/main_cover/hat.jpg', price=50
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('favorite_toggle', args=[self.product.id]))
+        flags = {row['id']: row['is_favorite'] for row in self.client.get(reverse('product_list')).data['results']}
+        self.assertEqual(flags, {self.product.id: True, other.id: False})
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('product_list'))
+        self.assertFalse([q for q in queries if 'product_favorite' in q['sql']])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('favorite_toggle', args=[self.product.id]))
+        detail = self.client.get(reverse('product_detail', args=[self.product.id])).data
+        self.assertFalse(detail['product']['is_favorite'])
+
+    def test_add_invalidates_shared_cache_after_commit(self):
+        self.assertEqual(favorite_ids(self.user), frozenset())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            add_favorite(self.user, self.product.id)
+            self.assertIsNotNone(caches['favorites'].get(f'favorite-ids:{self.user.pk}'))
+
+        self.assertEqual(favorite_ids(self.user), {self.product.id})
+
+
+class FavoriteSyncTests(ShopTestCase):
+    def test_add_and_remove_are_idempotent(self):
+        url = reverse('favorite_toggle', args=[self.product.id])
+        for _ in range(2):
+            self.assertEqual(self.client.put(url).data, {'status': 'added'})
+        self.assertEqual(Favorite.objects.filter(user=self.user).count(), 1)
+        for _ in range(2):
+            self.assertEqual(self.client.delete(url).status_code, 200)
+        self.assertFalse(Favorite.objects.exists())
+        self.assertEqual(self.client.put(reverse('favorite_toggle', args=[999])).status_code, 404)
+
+    def test_remove_is_a_single_delete(self):
+        Favorite.objects.create(user=self.user, product=self.product)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(remove_favorite(self.user, self.product.id))
+        self.assertEqual(len(queries), 1)
+        self.assertTrue(queries[0]['sql'].startswith('DELETE'))
+
+    def test_sync_applies_changes_in_one_request(self):
+        other = Product.objects.create(
+            category=self.category, name='Панама', description='Описание',
+            main_cover='products/main_cover/hat.jpg', price=50
+        )
+        Favorite.objects.create(user=self.user, product=other)
+        self.assertEqual(favorite_ids(self.user), {other.id})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse('favorite_sync'), {'add': [self.product.id, 999], 'remove': [other.id]}, format='json'
+            )
+        self.assertEqual(response.data, {'favorite_ids': [self.product.id], 'ignored': [999]})
+        self.assertEqual(favorite_ids(self.user), {self.product.id})
+
+        response = self.client.post(reverse('favorite_sync'), {'add': [1], 'remove': [1]}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class ReferenceCacheTests(ShopTestCase):
+    def test_reference_tables_are_served_from_memory_until_changed(self):
+        before = reference_cache.stats()['tables']['sizes']
+        self.assertEqual(self.client.get(reverse('size_list')).data, [{'id': self.size.id, 'name': 'M'}])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('size_list'))
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(len(response.data), 1)
+
+        Size.objects.create(name='L')
+        self.assertEqual([size['name'] for size in self.client.get(reverse('size_list')).data], ['L', 'M'])
+        after = reference_cache.stats()['tables']['sizes']
+        self.assertEqual(
+            {key: after[key] - before[key] for key in ('hits', 'misses', 'invalidations')},
+            {'hits': 1, 'misses': 2, 'invalidations': 1}
+        )
+        self.assertEqual(after['size'], 2)
+
+
+class OrderHistoryTests(ShopTestCase):
+    def test_history_pages_use_fixed_number_of_queries(self):
+        for _ in range(25):
+            order = Order.objects.create(user=self.user, total=200)
+            OrderItem.objects.create(order=order, product=self.product, size=self.size, quantity=2, price=100)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('order_history'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 20)
+        self.assertEqual(response.data['results'][0]['items'][0]['size'], 'M')
+        self.assertEqual(len(queries), 2)
+
+        response = self.client.get(response.data['next'])
+        self.assertEqual(len(response.data['results']), 5)
+        self.assertIsNone(response.data['next'])
+
+
+class OrderExportTests(ShopTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.order = Order.objects.create(user=cls.user, total=300)
+        OrderItem.objects.create(order=cls.order, product=cls.product, size=cls.size, quantity=3, price=100)
+
+    def export(self, fmt):
+        iterator = QuerySet.iterator
+        with mock.patch.object(QuerySet, 'iterator', autospec=True, side_effect=iterator) as spy, \
+                mock.patch.object(OrderItem, 'from_db', side_effect=AssertionError('model instance')):
+            lines = list(order_export.iter_lines(order_export.order_lines(), fmt, chunk_size=10))
+        spy.assert_called_once()
+        self.assertIs(spy.call_args.args[0]._iterable_class, ValuesListIterable)
+        self.assertEqual(spy.call_args.kwargs, {'chunk_size': 10})
+        return lines
+
+    def test_csv_export_streams_header_and_rows(self):
+        rows = list(csv.reader(io.StringIO(''.join(self.export('csv')))))
+
+        self.assertEqual(rows[0], list(order_export.COLUMNS))
+        self.assertEqual(len(rows), 2)
+        line = dict(zip(rows[0], rows[1]))
+        self.assertEqual(
+            (line['order_id'], line['username'], line['product_name'], line['size'], line['quantity']),
+            (str(self.order.id), 'buyer', 'Кепка', 'M', '3'),
+        )
+
+    def test_jsonl_export_streams_one_object_per_row(self):
+        lines = self.export('jsonl')
+
+        self.assertEqual(len(lines), 1)
+        line = json.loads(lines[0])
+        self.assertEqual(list(line), list(order_export.COLUMNS))
+        self.assertEqual(
+            (line['order_id'], line['status'], line['size'], line['quantity']),
+            (self.order.id, self.order.status, 'M', 3),
+        )
+
+    def test_command_writes_to_command_stdout(self):
+        out = io.StringIO()
+        call_command('export_orders', '--format', 'jsonl', stdout=out)
+
+        lines = out.getvalue().splitlines()
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(json.loads(lines[0])['order_id'], self.order.id)
+
+
+class OrderStatusTransitionTests(ShopTestCase):
+    def create_order(self, quantity=2):
+        order = Order.objects.create(user=self.user, total=100 * quantity)
+        OrderItem.objects.create(order=order, product=self.product, size=self.size, quantity=quantity, price=100)
+        return Order.objects.get(pk=order.pk)
+
+    def test_non_status_save_does_not_refetch_order(self):
+        order = self.create_order()
+        order.total = 150
+        with CaptureQueriesContext(connection) as queries:
+            order.save()
+        self.assertEqual(len(queries), 1)
+        self.assertFalse(OrderStatusEvent.objects.exists())
+
+    def test_transitions_are_logged_and_validated(self):
+        order = self.create_order()
+        self.assertTrue(change_order_status(order, OrderStatusEnum.ACCEPTED, user=self.user))
+        self.assertFalse(change_order_status(order, OrderStatusEnum.ACCEPTED))
+        self.inventory.refresh_from_db()
+        self.assertEqual(self.inventory.stock, 8)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.total_stock, 8)
+
+        order.status = OrderStatusEnum.REJECTED
+        with self.assertRaises(InvalidStatusTransition):
+            order.save()
+
+        event = order.status_events.get()
+        self.assertEqual(
+            (event.from_status, event.to_status, event.user),
+            (OrderStatusEnum.IN_PROGRESS, OrderStatusEnum.ACCEPTED, self.user)
+        )
+
+
+class CartConcurrencyTests(ShopFixturesMixin, TransactionTestCase):
+    clients = 20
+    adds_per_client = 10
+
+    def setUp(self):
+        self.create_fixtures()
+        self.cart = Cart.objects.create(user=self.user)
+
+    def run_parallel_adds(self):
+        failures = []
+        barrier = threading.Barrier(self.clients)
+
+        def worker():
+            barrier.wait()
+            try:
+                for _ in range(self.adds_per_client):
+                    try:
+                        add_cart_item(self.cart, self.product, self.size, 1)
+                    except InsufficientStockError:
+                        failures.append(1)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(self.clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return len(failures)
+
+    def test_parallel_adds_do_not_lose_updates(self):
+        total = self.clients * self.adds_per_client
+        ProductSizeInventory.objects.filter(pk=self.inventory.pk).update(stock=total)
+
+        self.assertEqual(self.run_parallel_adds(), 0)
+        self.assertEqual(CartItem.objects.get(cart=self.cart).quantity, total)
+
+    def test_parallel_adds_never_exceed_stock(self):
+        total = self.clients * self.adds_per_client
+        ProductSizeInventory.objects.filter(pk=self.inventory.pk).update(stock=50)
+
+        self.assertEqual(self.run_parallel_adds(), total - 50)
+        self.assertEqual(CartItem.objects.get(cart=self.cart).quantity, 50)
+
+    def test_first_add_respects_stock(self):
+        with self.assertRaises(InsufficientStockError):
+            add_cart_item(self.cart, self.product, self.size, 11)
+
+        self.assertFalse(CartItem.objects.filter(cart=self.cart).exists())
@@ -0,0 +1,81 @@
+import hashlib
+
+from django.core.files.storage import default_storage
+from django.core.files.uploadhandler import SkipFile, TemporaryFileUploadHandler
+
+
+RECEIPT_MAX_SIZE = 5 * 1024 * 1024
+RECEIPT_SIGNATURES = (
+    (b'\xff\xd8\xff', 'jpg'),
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'%PDF-', 'pdf'),
+)
+
+
+def detect_receipt_type(head):
+    for signature, extension in RECEIPT_SIGNATURES:
+        if head.startswith(signature):
+            return extension
+    return None
+
+
+class ReceiptUploadHandler(TemporaryFileUploadHandler):
+    """Пишет чек во временный файл по мере получения, проверяя тип по сигнатуре
+    первых байт и размер, и попутно считает sha256 содержимого.
+
+    Некорректный файл пропускается сразу, не дочитываясь до конца; причина
+    сохраняется в error.
+    """
+    field_name = 'receipt'
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.error = None
+        self.extension = None
+        self.size = 0
+        self.digest = None
+        self.head = b''
+
+    def new_file(self, field_name, *args, **kwargs):
+        if field_name != self.field_name:
+            raise SkipFile()
+        super().new_file(field_name, *args, **kwargs)
+        self.digest = hashlib.sha256()
+        self.size = 0
+        self.head = b''
+        self.extension = None
+
+    def receive_data_chunk(self, raw_data, start):
+        self.size += len(raw_data)
+        if self.size > RECEIPT_MAX_SIZE:
+            self.error = "Файл чека слишком большой (максимум 5 МБ)"
+            raise SkipFile()
+        if self.extension is None:
+            self.head += raw_data[:16]
+            if len(self.head) >= 8 or len(raw_data) < self.chunk_size:
+                self.extension = detect_receipt_type(self.head)
+                if self.extension is None:
+                    self.error = "Чек должен быть изображением JPG, PNG или PDF-файлом"
+                    raise SkipFile()
+        self.digest.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        if self.extension is None:
+            self.extension = detect_receipt_type(self.head)
+            if self.extension is None:
+                self.error = "Чек должен быть изображением JPG, PNG или PDF-файлом"
+                return None
+        file.content_hash = self.digest.hexdigest()
+        file.extension = self.extension
+        return file
+
+
+def store_receipt(file):
+    """Сохраняет чек по адресу, зависящему только от содержимого; одинаковые файлы не дублируются."""
+    name = f"orders/receipts/{file.content_hash[:2]}/{file.content_hash}.{file.extension}"
+    if not default_storage.exists(name):
+        file.seek(0)
+        name = default_storage.save(name, file)
+    return name
@@ -7,11 +7,17 @@ urlpatterns = [
     path('products/', views.ProductListView.as_view(), name='product_list'),
     path('products/<int:pk>/', views.ProductDetailView.as_view(), name='product_detail'),
     path('cart/', views.CartView.as_view(), name='cart'),
+    path('guest-cart/', views.GuestCartView.as_view(), name='guest_cart'),
+    path('cart/bulk/', views.CartBulkView.as_view(), name='cart_bulk'),
     path('cart/items/<int:item_id>/', views.CartItemUpdateView.as_view(), name='cart_item_update'),
     path('sizes/', views.SizeListView.as_view(), name='size_list'),
+    path('categories/', views.CategoryListView.as_view(), name='category_list'),
+    path('reference-cache/', views.ReferenceCacheStatsView.as_view(), name='reference_cache_stats'),
     path('favorites/', views.FavoriteListView.as_view(), name='favorite_list'),
+    path('favorites/sync/', views.FavoriteSyncView.as_view(), name='favorite_sync'),
     path('favorites/<int:product_id>/', views.FavoriteToggleView.as_view(), name='favorite_toggle'),
     path('orders/', views.OrderCreateView.as_view(), name='order_create'),
+    path('orders/history/', views.OrderHistoryView.as_view(), name='order_history'),
     path('orders/<int:order_id>/receipt/', views.OrderReceiptUploadView.as_view(), name='order_receipt_upload'),
     path('orders/<int:order_id>/', views.OrderStatusView.as_view(), name='order_status'),
 ]
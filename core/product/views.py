@@ -1,15 +1,17 @@
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import PageNumberPagination, CursorPagination
 from rest_framework.views import APIView, Response
-from django.db.models import F, Q, Count, ExpressionWrapper, DecimalField
-from rest_framework.permissions import IsAuthenticated
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q, Count, ExpressionWrapper, DecimalField, Prefetch, prefetch_related_objects
+from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
 from .choices import OrderStatusEnum
 from django.shortcuts import get_object_or_404
 from rest_framework import status
+from core.db_router import ReplicaReadMixin, PrimaryStickyMixin
 from .models import (
     Product, Banner, Brand, Cart,
     CartItem, Size, Image,
     Favorite, ProductSizeInventory,
-    OrderItem, PaymentQR, Order)
+    OrderItem, Order)
 from .serializers import (
     BannerListSerializer,
     BrandListSerializer,
@@ -17,13 +19,18 @@ from .serializers import (
     ProductDetailSerializer,
     RelatedProductSerializer,
     CartItemSerializer,
-    CartSerializer, SizeSerializer,
-    FavoriteSerializer, PaymentQRSerializer,
-    OrderSerializer,
+    CartSerializer,
+    FavoriteSerializer, FavoriteSyncSerializer,
+    OrderSerializer, CartBulkSerializer, GuestCartSerializer,
 )
+from . import guest_cart
+from .favorites import favorite_ids, add_favorite, remove_favorite, sync_favorites
+from .reference_cache import reference_cache
+from .uploads import ReceiptUploadHandler, store_receipt
+from .services import apply_cart_lines, add_cart_item, update_cart_item, InsufficientStockError
 
 
-class IndexView(APIView):
+class IndexView(ReplicaReadMixin, APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
@@ -35,8 +42,9 @@ class IndexView(APIView):
 
         banners_serializer = BannerListSerializer(banners, many=True)
         brands_serializer = BrandListSerializer(brands, many=True)
-        best_sellers_products_serializer = ProductListSerializer(best_sellers_products, many=True)
-        promo_products_serializer = ProductListSerializer(promo_products, many=True)
+        context = {'favorite_ids': favorite_ids(request.user)}
+        best_sellers_products_serializer = ProductListSerializer(best_sellers_products, many=True, context=context)
+        promo_products_serializer = ProductListSerializer(promo_products, many=True, context=context)
 
         data = {
             "banners": banners_serializer.data,
@@ -48,7 +56,7 @@ class IndexView(APIView):
         return Response(data)
 
 
-class ProductDetailView(APIView):
+class ProductDetailView(ReplicaReadMixin, APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request, pk):
@@ -61,8 +69,9 @@ class ProductDetailView(APIView):
             category=product.category, is_active=True
         ).exclude(pk=pk).select_related('category')[:4]
 
-        product_serializer = ProductDetailSerializer(product)
-        related_products_serializer = RelatedProductSerializer(related_products, many=True)
+        context = {'favorite_ids': favorite_ids(request.user)}
+        product_serializer = ProductDetailSerializer(product, context=context)
+        related_products_serializer = RelatedProductSerializer(related_products, many=True, context=context)
 
         data = {
             'product': product_serializer.data,
@@ -72,16 +81,28 @@ class ProductDetailView(APIView):
         return Response(data)
 
 
-class SizeListView(APIView):
+class SizeListView(ReplicaReadMixin, APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        sizes = Size.objects.all()
-        serializer = SizeSerializer(sizes, many=True)
-        return Response(serializer.data)
+        return Response(reference_cache.get('sizes'))
+
+
+class CategoryListView(ReplicaReadMixin, APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        return Response(reference_cache.get('categories'))
+
+
+class ReferenceCacheStatsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(reference_cache.stats())
 
 
-class CartView(APIView):
+class CartView(PrimaryStickyMixin, APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
@@ -91,33 +112,108 @@ class CartView(APIView):
 
     def post(self, request):
         cart, _ = Cart.objects.get_or_create(user=request.user)
-        serializer = CartItemSerializer(data=request.data)
+        # Остаток проверяет охраняемый UPDATE в add_cart_item, без отдельного запроса
+        serializer = CartItemSerializer(data=request.data, context={'check_stock': False})
         if serializer.is_valid():
             product = serializer.validated_data['product']
             size = serializer.validated_data['size']
             quantity = serializer.validated_data['quantity']
 
-            cart_item, created = CartItem.objects.get_or_create(
-                cart=cart,
-                product=product,
-                size=size,
-                defaults={'quantity': quantity}
-            )
-            if not created:
-                new_quantity = cart_item.quantity + quantity
-                inventory = ProductSizeInventory.objects.filter(product=product, size=size).first()
-                if new_quantity > inventory.stock:
-                    return Response({
-                        "error": f"Недостаточно товара. В наличии: {inventory.stock} шт."
-                    }, status=status.HTTP_400_BAD_REQUEST)
-                cart_item.quantity = new_quantity
-                cart_item.save()
+            try:
+                add_cart_item(cart, product, size, quantity)
+            except InsufficientStockError as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
             return Response(CartSerializer(cart).data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class CartItemUpdateView(APIView):
+class GuestCartView(APIView):
+    """Корзина анонимного покупателя, хранится в кэше по токену из заголовка X-Guest-Cart."""
+    permission_classes = [AllowAny]
+
+    def get_token(self, request):
+        return request.headers.get('X-Guest-Cart')
+
+    def render(self, token, lines, status_code=status.HTTP_200_OK):
+        products = Product.objects.filter(
+            id__in={product_id for product_id, _ in lines}
+        ).select_related('category').in_bulk()
+        items = [
+            CartItem(product=products[product_id], size=Size(name=size_name), quantity=quantity)
+            for (product_id, size_name), quantity in lines.items()
+            if product_id in products
+        ]
+        return Response(GuestCartSerializer({'token': token, 'items': items}).data, status=status_code)
+
+    def get(self, request):
+        token = self.get_token(request)
+        lines = guest_cart.get_guest_cart(token)
+        if lines is None:
+            return Response({"error": "Гостевая корзина не найдена"}, status=status.HTTP_404_NOT_FOUND)
+        return self.render(token, lines)
+
+    def post(self, request):
+        serializer = CartItemSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        product = serializer.validated_data['product']
+        size = serializer.validated_data['size']
+        quantity = serializer.validated_data['quantity']
+
+        token = self.get_token(request)
+        lines = guest_cart.get_guest_cart(token)
+        if lines is None:
+            token = guest_cart.create_guest_cart()
+            lines = {}
+
+        key = (product.id, size.name)
+        new_quantity = lines.get(key, 0) + quantity
+        stock = ProductSizeInventory.objects.filter(product=product, size=size).values_list('stock', flat=True).first()
+        if new_quantity > (stock or 0):
+            return Response({
+                "error": f"Недостаточно товара. В наличии: {stock or 0} шт."
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        lines[key] = new_quantity
+        guest_cart.save_guest_cart(token, lines)
+        return self.render(token, lines, status.HTTP_201_CREATED)
+
+    def delete(self, request):
+        token = self.get_token(request)
+        lines = guest_cart.get_guest_cart(token)
+        if lines is None:
+            return Response({"error": "Гостевая корзина не найдена"}, status=status.HTTP_404_NOT_FOUND)
+
+        product_id = request.data.get('product')
+        size_name = request.data.get('size')
+        if product_id is None:
+            lines = {}
+        else:
+            try:
+                lines.pop((int(product_id), size_name), None)
+            except (TypeError, ValueError):
+                return Response({"error": "Неверный идентификатор товара"}, status=status.HTTP_400_BAD_REQUEST)
+        guest_cart.save_guest_cart(token, lines)
+        return self.render(token, lines)
+
+
+class CartBulkView(PrimaryStickyMixin, APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = CartBulkSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        cart, _ = Cart.objects.get_or_create(user=request.user)
+        apply_cart_lines(cart, serializer.validated_data['items'])
+
+        prefetch_related_objects([cart], 'items__product__category', 'items__size')
+        return Response(CartSerializer(cart).data)
+
+
+class CartItemUpdateView(PrimaryStickyMixin, APIView):
     permission_classes = [IsAuthenticated]
 
     def put(self, request, item_id):
@@ -127,37 +223,30 @@ class CartItemUpdateView(APIView):
         quantity = request.data.get('quantity')
         size_name = request.data.get('size')
 
-        if quantity is not None:
-            if not isinstance(quantity, int) or quantity < 1:
-                return Response({"error": "Количество должно быть положительным числом"},
-                                status=status.HTTP_400_BAD_REQUEST)
-            # Проверяем запас
-            inventory = ProductSizeInventory.objects.filter(
-                product=cart_item.product, size=cart_item.size
-            ).first()
-            if quantity > inventory.stock:
-                return Response({
-                    "error": f"Недостаточно товара. В наличии: {inventory.stock} шт."
-                }, status=status.HTTP_400_BAD_REQUEST)
-            cart_item.quantity = quantity
+        if quantity is not None and (not isinstance(quantity, int) or quantity < 1):
+            return Response({"error": "Количество должно быть положительным числом"},
+                            status=status.HTTP_400_BAD_REQUEST)
 
+        size = cart_item.size
         if size_name is not None:
             size = get_object_or_404(Size, name=size_name)
-            inventory = ProductSizeInventory.objects.filter(product=cart_item.product, size=size).first()
-            if not inventory:
-                return Response({"error": "Выбранный размер недоступен для этого товара"},
-                                status=status.HTTP_400_BAD_REQUEST)
-            if inventory.stock < cart_item.quantity:
-                return Response({
-                    "error": f"Недостаточно товара для размера {size_name}. В наличии: {inventory.stock} шт."
-                }, status=status.HTTP_400_BAD_REQUEST)
             if CartItem.objects.filter(cart=cart, product=cart_item.product, size=size).exclude(
                     id=cart_item.id).exists():
                 return Response({"error": "Товар с этим размером уже есть в корзине"},
                                 status=status.HTTP_400_BAD_REQUEST)
-            cart_item.size = size
 
-        cart_item.save()
+        try:
+            update_cart_item(cart_item, size, quantity if quantity is not None else cart_item.quantity)
+        except InsufficientStockError as e:
+            if e.stock is None:
+                return Response({"error": "Выбранный размер недоступен для этого товара"},
+                                status=status.HTTP_400_BAD_REQUEST)
+            if size_name is not None:
+                return Response({
+                    "error": f"Недостаточно товара для размера {size_name}. В наличии: {e.stock} шт."
+                }, status=status.HTTP_400_BAD_REQUEST)
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
         return Response(CartSerializer(cart).data)
 
     def delete(self, request, item_id):
@@ -167,7 +256,7 @@ class CartItemUpdateView(APIView):
         return Response(CartSerializer(cart).data)
 
 
-class FavoriteListView(APIView):
+class FavoriteListView(ReplicaReadMixin, APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
@@ -179,21 +268,39 @@ class FavoriteListView(APIView):
         return Response(serializer.data)
 
 
-class FavoriteToggleView(APIView):
+class FavoriteToggleView(PrimaryStickyMixin, APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request, product_id):
-        product = get_object_or_404(Product, id=product_id, is_active=True)
-        favorite, created = Favorite.objects.get_or_create(
-            user=request.user,
-            product=product
-        )
-        if not created:
-            favorite.delete()
+        if remove_favorite(request.user, product_id):
             return Response({"status": "removed"}, status=status.HTTP_200_OK)
-
+        if not add_favorite(request.user, product_id):
+            return Response({"error": "Товар не найден"}, status=status.HTTP_404_NOT_FOUND)
+        favorite = Favorite.objects.select_related('product__category').get(user=request.user, product_id=product_id)
         return Response(FavoriteSerializer(favorite).data, status=status.HTTP_201_CREATED)
 
+    def put(self, request, product_id):
+        if not add_favorite(request.user, product_id):
+            return Response({"error": "Товар не найден"}, status=status.HTTP_404_NOT_FOUND)
+        return Response({"status": "added"}, status=status.HTTP_200_OK)
+
+    def delete(self, request, product_id):
+        remove_favorite(request.user, product_id)
+        return Response({"status": "removed"}, status=status.HTTP_200_OK)
+
+
+class FavoriteSyncView(PrimaryStickyMixin, APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = FavoriteSyncSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ignored = sync_favorites(request.user, **serializer.validated_data)
+        return Response({
+            "favorite_ids": sorted(Favorite.objects.filter(user=request.user).values_list('product_id', flat=True)),
+            "ignored": ignored,
+        })
+
 
 class StandardResultsSetPagination(PageNumberPagination):
     page_size = 20
@@ -201,10 +308,15 @@ class StandardResultsSetPagination(PageNumberPagination):
     max_page_size = 100
 
 
-class ProductListView(APIView):
+class ProductListView(ReplicaReadMixin, APIView):
     permission_classes = [IsAuthenticated]
     pagination_class = StandardResultsSetPagination
 
+    @property
+    def throttle_scope(self):
+        # Сортировка по популярности агрегирует избранное по всему каталогу
+        return 'popular_products' if self.request.query_params.get('sort') == 'popular' else None
+
     def get(self, request):
         sort = request.query_params.get('sort', 'new')
         products = Product.objects.filter(is_active=True).select_related('category')
@@ -234,13 +346,42 @@ class ProductListView(APIView):
 
         paginator = self.pagination_class()
         paginated_products = paginator.paginate_queryset(products, request)
-        serializer = ProductListSerializer(paginated_products, many=True)
+        serializer = ProductListSerializer(
+            paginated_products, many=True, context={'favorite_ids': favorite_ids(request.user)}
+        )
+
+        return paginator.get_paginated_response(serializer.data)
+
+
+class OrderHistoryPagination(CursorPagination):
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-created_at', '-id')
 
+
+def orders_with_items(queryset):
+    # product в OrderItemSerializer выводится как id и берётся из product_id без запроса
+    return queryset.prefetch_related(
+        Prefetch('items', queryset=OrderItem.objects.select_related('size').order_by('id'))
+    )
+
+
+class OrderHistoryView(ReplicaReadMixin, APIView):
+    permission_classes = [IsAuthenticated]
+    pagination_class = OrderHistoryPagination
+
+    def get(self, request):
+        orders = orders_with_items(Order.objects.filter(user=request.user))
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(orders, request, view=self)
+        serializer = OrderSerializer(page, many=True)
         return paginator.get_paginated_response(serializer.data)
 
 
-class OrderCreateView(APIView):
+class OrderCreateView(PrimaryStickyMixin, APIView):
     permission_classes = [IsAuthenticated]
+    throttle_scope = 'order_create'
 
     def post(self, request):
         cart = get_object_or_404(Cart, user=request.user)
@@ -281,29 +422,38 @@ class OrderCreateView(APIView):
         else:
             cart.items.all().delete()
 
-        payment_qrs = PaymentQR.objects.all()
-        qr_serializer = PaymentQRSerializer(payment_qrs, many=True)
-
         response_data = OrderSerializer(order).data
-        response_data['payment_qrs'] = qr_serializer.data
+        response_data['payment_qrs'] = reference_cache.get('payment_qrs')
 
         return Response(response_data, status=status.HTTP_201_CREATED)
 
 
-class OrderReceiptUploadView(APIView):
+class OrderReceiptUploadView(PrimaryStickyMixin, APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request, order_id):
         order = get_object_or_404(Order, id=order_id, user=request.user, status=OrderStatusEnum.IN_PROGRESS)
+        # Обработчик должен быть установлен до первого обращения к request.data/FILES.
+        handler = ReceiptUploadHandler(request._request)
+        request.upload_handlers = [handler]
         receipt = request.FILES.get('receipt')
+        if handler.error:
+            return Response({"error": handler.error}, status=status.HTTP_400_BAD_REQUEST)
         if not receipt:
             return Response({"error": "Чек обязателен"}, status=status.HTTP_400_BAD_REQUEST)
 
-        if receipt.size > 5 * 1024 * 1024:
-            return Response({"error": "Файл чека слишком большой (максимум 5 МБ)"}, status=status.HTTP_400_BAD_REQUEST)
-
-        order.receipt = receipt
-        order.save()
+        if order.receipt_hash == receipt.content_hash:
+            return Response(OrderSerializer(order).data, status=status.HTTP_200_OK)
+        if Order.objects.filter(receipt_hash=receipt.content_hash).exists():
+            return Response({"error": "Этот чек уже загружен к другому заказу"}, status=status.HTTP_400_BAD_REQUEST)
+
+        order.receipt.name = store_receipt(receipt)
+        order.receipt_hash = receipt.content_hash
+        try:
+            with transaction.atomic():
+                order.save(update_fields=['receipt', 'receipt_hash', 'updated_at'])
+        except IntegrityError:
+            return Response({"error": "Этот чек уже загружен к другому заказу"}, status=status.HTTP_400_BAD_REQUEST)
         return Response(OrderSerializer(order).data, status=status.HTTP_200_OK)
 
 
@@ -311,5 +461,5 @@ class OrderStatusView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request, order_id):
-        order = get_object_or_404(Order, id=order_id, user=request.user)
+        order = get_object_or_404(orders_with_items(Order.objects.all()), id=order_id, user=request.user)
         return Response(OrderSerializer(order).data)
@@ -0,0 +1,72 @@
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from core.background import BackgroundQueue
+from product.models import Cart, CartItem, Favorite, Order, OrderItem, OrderStatusEvent
+from .models import MyUser, PasswordResetCode
+from .revocation import revoke_user_tokens
+
+logger = logging.getLogger(__name__)
+
+_jobs = BackgroundQueue('account-purge', logger)
+
+# Порядок удаления: сначала дочерние строки, чтобы каскад при удалении
+# родителей ничего не загружал в память
+PURGE_STEPS = (
+    (CartItem, 'cart__user_id'),
+    (Cart, 'user_id'),
+    (Favorite, 'user_id'),
+    (OrderItem, 'order__user_id'),
+    (OrderStatusEvent, 'order__user_id'),
+    (Order, 'user_id'),
+    (PasswordResetCode, 'user_id'),
+    (BlacklistedToken, 'token__user_id'),
+    (OutstandingToken, 'user_id'),
+)
+
+
+def request_account_deletion(user):
+    """Сразу отключает аккаунт и отзывает токены; данные удаляются позже пачками."""
+    with transaction.atomic():
+        MyUser.objects.filter(pk=user.pk).update(is_active=False, deletion_requested_at=timezone.now())
+        revoke_user_tokens(user)
+        transaction.on_commit(lambda: schedule_purge(user.pk))
+    user.is_active = False
+
+
+def purge_user(user_id, batch_size=None):
+    """Удаляет связанные строки пачками по batch_size, каждую пачку отдельным запросом,
+    а затем саму учётную запись. Повторный запуск продолжает с места остановки."""
+    batch_size = batch_size or settings.ACCOUNT_PURGE_BATCH_SIZE
+    deleted = {}
+    for model, lookup in PURGE_STEPS:
+        queryset = model.objects.filter(**{lookup: user_id})
+        while True:
+            ids = list(queryset.values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                break
+            model.objects.filter(pk__in=ids).delete()
+            deleted[model._meta.label] = deleted.get(model._meta.label, 0) + len(ids)
+    MyUser.objects.filter(pk=user_id, is_active=False, deletion_requested_at__isnull=False).delete()
+    return deleted
+
+
+def schedule_purge(user_id):
+    if settings.ACCOUNT_PURGE_IN_BACKGROUND:
+        _jobs.submit(purge_user, user_id, error_message=f"Не удалось удалить данные пользователя {user_id}")
+    else:
+        purge_user(user_id)
+
+
+def purge_pending_accounts(batch_size=None):
+    """Дочищает аккаунты, удаление которых не завершилось (например, из-за перезапуска)."""
+    user_ids = list(
+        MyUser.objects.filter(is_active=False, deletion_requested_at__isnull=False).values_list('pk', flat=True)
+    )
+    for user_id in user_ids:
+        purge_user(user_id, batch_size)
+    return user_ids
@@ -43,7 +43,7 @@ class UserChangeForm(forms.ModelForm):
 
     class Meta:
         model = MyUser
-        fields = ('password', 'is_admin')
+        fields = ('password', 'is_admin', 'is_active')
 
 
 class UserAdmin(BaseUserAdmin):
@@ -54,8 +54,8 @@ class UserAdmin(BaseUserAdmin):
     # The fields to be used in displaying the User model.
     # These override the definitions on the base UserAdmin
     # that reference specific fields on auth.User.
-    list_display = ('username', 'is_admin')
-    list_filter = ('is_admin', 'created_date')
+    list_display = ('username', 'is_admin', 'is_active')
+    list_filter = ('is_admin', 'is_active', 'created_date')
     fieldsets = (
         (None, {'fields': (
             'password',
@@ -63,7 +63,7 @@ class UserAdmin(BaseUserAdmin):
             'username',
             'phone_number',
         )}),
-        ('Permissions', {'fields': ('is_admin', )}),
+        ('Permissions', {'fields': ('is_admin', 'is_active')}),
     )
     # add_fieldsets is not a standard ModelAdmin attribute. UserAdmin
     # overrides get_fieldsets to use this attribute when creating a user.
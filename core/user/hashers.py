@@ -0,0 +1,14 @@
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+
+class TunablePBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """PBKDF2-SHA256 с числом итераций из PASSWORD_PBKDF2_ITERATIONS.
+
+    Алгоритм тот же, что у стандартного хешера, поэтому существующие хеши
+    проверяются без изменений, а хеши с другим числом итераций обновляются при входе.
+    """
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_PBKDF2_ITERATIONS or PBKDF2PasswordHasher.iterations
@@ -0,0 +1,84 @@
+import statistics
+import time
+import uuid
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import check_password, make_password
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Замер скорости входа для каждого алгоритма хеширования паролей: '
+        'сколько проверок пароля в секунду выдерживает одно ядро и задержка выдачи токена.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hashers', nargs='+', default=list(settings.PASSWORD_HASHER_CLASSES),
+                            choices=list(settings.PASSWORD_HASHER_CLASSES), help='Алгоритмы для замера')
+        parser.add_argument('--seconds', type=float, default=3, help='Длительность замера проверки пароля')
+        parser.add_argument('--logins', type=int, default=20, help='Запросов на выдачу токена для каждого алгоритма')
+
+    def handle(self, *args, **options):
+        password = 'bench-password-' + uuid.uuid4().hex[:8]
+        prefix = f"bench-{uuid.uuid4().hex[:8]}"
+        self.stdout.write(f"Алгоритм по умолчанию: {settings.PASSWORD_HASHER}, "
+                          f"итераций PBKDF2: {settings.PASSWORD_PBKDF2_ITERATIONS or 'по умолчанию Django'}")
+
+        for name in options['hashers']:
+            hasher = settings.PASSWORD_HASHER_CLASSES[name]
+            hashers = [hasher] + [h for h in settings.PASSWORD_HASHERS if h != hasher]
+            with override_settings(PASSWORD_HASHERS=hashers):
+                try:
+                    encoded = make_password(password)
+                except ValueError as e:
+                    self.stdout.write(self.style.WARNING(f"{name}: пропущен ({e})"))
+                    continue
+                rate = self.verify_rate(password, encoded, options['seconds'])
+                latencies = self.login_latencies(prefix, name, password, options['logins'])
+
+            self.stdout.write(
+                f"{name}: {rate:.1f} входов/с на ядро, выдача токена p50 "
+                f"{statistics.median(latencies):.1f} мс, p95 {self.p95(latencies):.1f} мс"
+            )
+
+    def verify_rate(self, password, encoded, seconds):
+        count = 0
+        started = time.perf_counter()
+        while time.perf_counter() - started < seconds:
+            check_password(password, encoded)
+            count += 1
+        return count / (time.perf_counter() - started)
+
+    def login_latencies(self, prefix, name, password, logins):
+        user = User.objects.create_user(
+            email=f"{prefix}-{name}@example.com",
+            phone_number='0000000000',
+            username=f"{prefix}-{name}",
+            password=password,
+        )
+        client = APIClient(SERVER_NAME='localhost')
+        url = reverse('token_obtain_pair')
+        latencies = []
+        try:
+            for _ in range(logins):
+                started = time.perf_counter()
+                response = client.post(url, {'email': user.email, 'password': password}, format='json')
+                latencies.append((time.perf_counter() - started) * 1000)
+                if response.status_code != 200:
+                    self.stdout.write(self.style.ERROR(f"{name}: вход не удался ({response.status_code})"))
+                    break
+        finally:
+            user.delete()
+        return latencies
+
+    def p95(self, values):
+        ordered = sorted(values)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
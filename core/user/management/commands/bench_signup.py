@@ -0,0 +1,106 @@
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, OperationalError
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+
+User = get_user_model()
+
+FAST_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+class Command(BaseCommand):
+    help = (
+        'Замер пропускной способности регистрации при множестве параллельных клиентов '
+        'и числа запросов к БД на одну регистрацию.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=8, help='Количество параллельных клиентов')
+        parser.add_argument('--requests', type=int, default=25, help='Регистраций на одного клиента')
+        parser.add_argument('--fast-hasher', action='store_true',
+                            help='Хешировать пароли MD5, чтобы замер показывал стоимость запросов, а не хеширования')
+        parser.add_argument('--keep', action='store_true', help='Не удалять созданных пользователей')
+
+    def handle(self, *args, **options):
+        hashers = FAST_HASHERS if options['fast_hasher'] else settings.PASSWORD_HASHERS
+        with override_settings(PASSWORD_HASHERS=hashers):
+            self.run(options)
+
+    def payload(self, prefix, suffix):
+        return {
+            'email': f"{prefix}-{suffix}@example.com",
+            'username': f"{prefix}-{suffix}",
+            'phone_number': '0555000000',
+            'password': 'bench-password',
+            'password_confirm': 'bench-password',
+        }
+
+    def run(self, options):
+        clients = options['clients']
+        requests_per_client = options['requests']
+        prefix = f"bench-{uuid.uuid4().hex[:8]}"
+        url = reverse('user_register')
+
+        # У каждого запроса свой адрес, чтобы лимит анонимных запросов с одного IP не искажал замер
+        client = APIClient(SERVER_NAME='localhost', REMOTE_ADDR='10.255.0.1')
+        with CaptureQueriesContext(connection) as queries:
+            client.post(url, self.payload(prefix, 'probe'), format='json')
+        with CaptureQueriesContext(connection) as duplicate_queries:
+            client.post(url, self.payload(prefix, 'probe'), format='json')
+
+        results = {'ok': 0, 'failed': 0, 'locked': 0}
+        lock = threading.Lock()
+        barrier = threading.Barrier(clients)
+
+        def worker(index):
+            client = APIClient(SERVER_NAME='localhost')
+            ok = failed = locked = 0
+            barrier.wait()
+            try:
+                for i in range(requests_per_client):
+                    try:
+                        response = client.post(
+                            url, self.payload(prefix, f"{index}-{i}"), format='json',
+                            REMOTE_ADDR=f"10.{index % 250}.{i // 250}.{i % 250 + 1}",
+                        )
+                    except OperationalError:
+                        locked += 1
+                        continue
+                    if response.status_code == 201:
+                        ok += 1
+                    else:
+                        failed += 1
+            finally:
+                connection.close()
+            with lock:
+                results['ok'] += ok
+                results['failed'] += failed
+                results['locked'] += locked
+
+        threads = [threading.Thread(target=worker, args=(index,)) for index in range(clients)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        db = settings.DATABASES['default']
+        self.stdout.write(f"Профиль: {settings.PROFILE}, backend: {db['ENGINE']}, хешер: {settings.PASSWORD_HASHERS[0]}")
+        self.stdout.write(f"Запросов к БД на регистрацию: {len(queries)}, на повторную регистрацию: {len(duplicate_queries)}")
+        self.stdout.write(f"Клиентов: {clients}, регистраций: {clients * requests_per_client}, время: {elapsed:.2f} с")
+        self.stdout.write(f"Успешно: {results['ok']}, ошибок ответа: {results['failed']}, "
+                          f"ошибок блокировки БД: {results['locked']}")
+        self.stdout.write(self.style.SUCCESS(f"Пропускная способность: {results['ok'] / elapsed:.1f} регистраций/с"))
+
+        if not options['keep']:
+            User.objects.filter(username__startswith=prefix).delete()
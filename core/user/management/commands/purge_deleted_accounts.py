@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from user.account_deletion import purge_pending_accounts
+
+
+class Command(BaseCommand):
+    help = 'Удаляет данные аккаунтов, удаление которых было запрошено, но не завершилось.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None, help='Строк за один DELETE')
+
+    def handle(self, *args, **options):
+        user_ids = purge_pending_accounts(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Удалено аккаунтов: {len(user_ids)}"))
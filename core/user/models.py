@@ -1,6 +1,8 @@
 from django.contrib.auth.base_user import AbstractBaseUser, BaseUserManager
+from django.contrib.auth.hashers import check_password
 from django.db import models
 from django.utils import timezone
+from .passwords import schedule_rehash
 import random
 import string
 
@@ -8,7 +10,7 @@ import string
 class MyUserManager(BaseUserManager):
     def create_user(self, email, phone_number, username, password=None):
         user = self.model(
-            email=email,
+            email=self.normalize_email(email),
             phone_number=phone_number,
             username=username,
         )
@@ -36,6 +38,8 @@ class MyUser(AbstractBaseUser):
     cover = models.ImageField(upload_to='user_cover', blank=True, null=True)
     created_date = models.DateTimeField(auto_now_add=True)
     is_admin = models.BooleanField(default=False)
+    is_active = models.BooleanField(default=True)
+    deletion_requested_at = models.DateTimeField(blank=True, null=True)
 
     objects = MyUserManager()
 
@@ -45,6 +49,10 @@ class MyUser(AbstractBaseUser):
     def __str__(self):
         return self.username
 
+    def check_password(self, raw_password):
+        """Как в AbstractBaseUser, но устаревший хеш обновляется в фоне, а не в запросе входа."""
+        return check_password(raw_password, self.password, lambda raw: schedule_rehash(self, raw))
+
     def has_perm(self, perm, obj=None):
         """Does the user have a specific permission?"""
         # Simplest possible answer: Yes, always
@@ -0,0 +1,27 @@
+import logging
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+
+from core.background import BackgroundQueue
+
+logger = logging.getLogger(__name__)
+
+_jobs = BackgroundQueue('password-rehash', logger)
+
+
+def _rehash(model, user_id, old_hash, raw_password):
+    try:
+        # Условие по старому хешу: смена пароля, случившаяся раньше, не будет перезаписана
+        model.objects.filter(pk=user_id, password=old_hash).update(password=make_password(raw_password))
+    except Exception:
+        logger.exception(f"Не удалось перехешировать пароль пользователя {user_id}")
+
+
+def schedule_rehash(user, raw_password):
+    """Обновляет хеш пароля выбранным алгоритмом, не задерживая ответ на вход."""
+    args = (type(user), user.pk, user.password, raw_password)
+    if settings.PASSWORD_REHASH_IN_BACKGROUND:
+        _jobs.submit(_rehash, *args)
+    else:
+        _rehash(*args)
@@ -0,0 +1,118 @@
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from core.background import BackgroundQueue
+
+logger = logging.getLogger(__name__)
+
+PRUNE_LOCK_KEY = 'token-revocation:prune'
+PRUNE_BATCH_SIZE = 5000
+
+_jobs = BackgroundQueue('token-prune', logger)
+
+
+def prune_expired_tokens(batch_size=PRUNE_BATCH_SIZE):
+    """Удаляет истёкшие outstanding/blacklisted токены пачками; возвращает число удалённых токенов.
+
+    Refresh-токен живёт REFRESH_TOKEN_LIFETIME, после expires_at он отклоняется
+    по подписи, и запись о нём больше не нужна.
+    """
+    now = timezone.now()
+    deleted = 0
+    while True:
+        ids = list(OutstandingToken.objects.filter(expires_at__lte=now).values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        BlacklistedToken.objects.filter(token_id__in=ids).delete()
+        OutstandingToken.objects.filter(pk__in=ids).delete()
+        deleted += len(ids)
+
+
+def _prune_and_log():
+    deleted = prune_expired_tokens()
+    if deleted:
+        logger.info(f"Удалено истёкших refresh-токенов: {deleted}")
+
+
+def schedule_prune():
+    if settings.TOKEN_PRUNE_INTERVAL <= 0:
+        return
+    # cache.add срабатывает один раз за интервал — при общем кеше и на все процессы сразу
+    if cache.add(PRUNE_LOCK_KEY, True, settings.TOKEN_PRUNE_INTERVAL):
+        _jobs.submit(_prune_and_log, error_message="Не удалось удалить истёкшие refresh-токены")
+
+
+class RevocationStore:
+    """Отозванные refresh-токены в памяти процесса: {jti: exp}.
+
+    Проверка — поиск в словаре. Раз в TOKEN_REVOCATION_SYNC_SECONDS подгружаются
+    записи, добавленные в BlacklistedToken другими процессами, и выбрасываются
+    истёкшие; токены, отозванные в этом процессе, видны сразу.
+    """
+
+    def __init__(self):
+        self._revoked = {}
+        self._synced_at = None
+        self._synced_wall = None
+        self._lock = threading.Lock()
+
+    def _sync(self):
+        if self._synced_at is not None and time.monotonic() - self._synced_at < settings.TOKEN_REVOCATION_SYNC_SECONDS:
+            return
+        with self._lock:
+            started = time.monotonic()
+            if self._synced_at is not None and started - self._synced_at < settings.TOKEN_REVOCATION_SYNC_SECONDS:
+                return
+            now = timezone.now()
+            rows = BlacklistedToken.objects.filter(token__expires_at__gt=now)
+            if self._synced_wall is not None:
+                # Запас на транзакции, закоммиченные позже, чем проставлен blacklisted_at
+                margin = timedelta(seconds=max(settings.TOKEN_REVOCATION_SYNC_SECONDS, 1) * 2)
+                rows = rows.filter(blacklisted_at__gte=self._synced_wall - margin)
+            for jti, expires_at in rows.values_list('token__jti', 'token__expires_at').iterator():
+                self._revoked[jti] = expires_at.timestamp()
+            timestamp = now.timestamp()
+            self._revoked = {jti: exp for jti, exp in self._revoked.items() if exp > timestamp}
+            self._synced_at = started
+            self._synced_wall = now
+        schedule_prune()
+
+    def is_revoked(self, jti):
+        self._sync()
+        return jti in self._revoked
+
+    def add(self, jti, exp):
+        # Под блокировкой: _sync перестраивает словарь, и запись без неё могла
+        # потеряться или оборвать его обход
+        with self._lock:
+            self._revoked[jti] = exp
+
+    def clear(self):
+        with self._lock:
+            self._revoked = {}
+            self._synced_at = None
+            self._synced_wall = None
+
+
+revocation_store = RevocationStore()
+
+
+def revoke_user_tokens(user):
+    """Отзывает все ещё действующие refresh-токены пользователя."""
+    tokens = list(
+        OutstandingToken.objects.filter(user=user, expires_at__gt=timezone.now())
+        .values_list('pk', 'jti', 'expires_at')
+    )
+    BlacklistedToken.objects.bulk_create(
+        [BlacklistedToken(token_id=pk) for pk, jti, expires_at in tokens], ignore_conflicts=True
+    )
+    for pk, jti, expires_at in tokens:
+        revocation_store.add(jti, expires_at.timestamp())
+    return len(tokens)
@@ -2,8 +2,55 @@ from rest_framework import serializers
 from .models import MyUser, PasswordResetCode
 from django.core.mail import send_mail
 from django.conf import settings
-from django.contrib.auth.hashers import check_password
-
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.contrib.auth.hashers import check_password, make_password
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from .tokens import RevocableRefreshToken
+
+
+
+UNIQUE_FIELD_ERRORS = {
+    'email': "Пользователь с таким email уже существует.",
+    'username': "Пользователь с таким именем уже существует.",
+}
+
+
+def unique_conflicts(exclude_pk=None, **values):
+    """Ошибки по всем занятым уникальным полям одним запросом: {'email': [...], ...}.
+
+    email сравнивается в том виде, в котором его сохраняет MyUserManager.
+    """
+    values = {field: value for field, value in values.items() if value is not None}
+    if 'email' in values:
+        values['email'] = MyUser.objects.normalize_email(values['email'])
+    if not values:
+        return {}
+    condition = Q()
+    for field, value in values.items():
+        condition |= Q(**{field: value})
+    taken = MyUser.objects.filter(condition)
+    if exclude_pk is not None:
+        taken = taken.exclude(pk=exclude_pk)
+    errors = {}
+    for row in taken.values(*values):
+        for field, value in values.items():
+            if row[field] == value:
+                errors[field] = [UNIQUE_FIELD_ERRORS[field]]
+    return errors
+
+
+def save_unique(save, exclude_pk=None, **values):
+    """Выполняет запись, полагаясь на уникальные индексы БД; при нарушении
+    одним запросом выясняет, какие поля заняты, и возвращает ошибки по полям."""
+    try:
+        with transaction.atomic():
+            return save()
+    except IntegrityError:
+        errors = unique_conflicts(exclude_pk=exclude_pk, **values)
+        if not errors:
+            raise
+        raise serializers.ValidationError(errors)
 
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
@@ -13,6 +60,8 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
     class Meta:
         model = MyUser
         fields = ('email', 'username', 'phone_number', 'password', 'password_confirm')
+        # Уникальность проверяет БД при вставке, без отдельного запроса на каждое поле
+        extra_kwargs = {'email': {'validators': []}, 'username': {'validators': []}}
 
     def validate(self, data):
         if data['password'] != data['password_confirm']:
@@ -21,12 +70,14 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         validated_data.pop('password_confirm')
-        user = MyUser.objects.create_user(
-            email=validated_data['email'],
+        # Пароль хешируется до savepoint: в транзакции остаётся только INSERT
+        user = MyUser(
+            email=MyUser.objects.normalize_email(validated_data['email']),
             username=validated_data['username'],
             phone_number=validated_data.get('phone_number'),
-            password=validated_data['password']
+            password=make_password(validated_data['password']),
         )
+        save_unique(user.save, email=user.email, username=user.username)
         return user
 
 
@@ -35,30 +86,32 @@ class UserProfileSerializer(serializers.ModelSerializer):
         model = MyUser
         fields = ('id', 'email', 'username', 'phone_number', 'address', 'cover')
         read_only_fields = ('id', 'email')
+        extra_kwargs = {'username': {'validators': []}}
 
     def validate_phone_number(self, value):
         if value and len(value) < 10:
             raise serializers.ValidationError("Номер телефона слишком короткий.")
         return value
 
-    def validate_username(self, value):
-        if self.instance and self.instance.username != value:
-            if MyUser.objects.filter(username=value).exclude(id=self.instance.id).exists():
-                raise serializers.ValidationError("Пользователь с таким именем уже существует.")
-        return value
+    def update(self, instance, validated_data):
+        return save_unique(
+            lambda: super(UserProfileSerializer, self).update(instance, validated_data),
+            exclude_pk=instance.pk,
+            username=validated_data.get('username'),
+        )
 
 
 class PasswordResetRequestSerializer(serializers.Serializer):
     email = serializers.EmailField()
 
     def validate_email(self, value):
-        if not MyUser.objects.filter(email=value).exists():
+        if not MyUser.objects.filter(email=value, is_active=True).exists():
             raise serializers.ValidationError("Пользователь с таким email не найден.")
         return value
 
     def save(self):
         email = self.validated_data['email']
-        user = MyUser.objects.get(email=email)
+        user = MyUser.objects.get(email=email, is_active=True)
         reset_code = PasswordResetCode.objects.create(user=user)
         subject = 'Сброс пароля'
         message = f'Ваш код для сброса пароля: {reset_code.code}\nКод действителен 15 минут.'
@@ -78,24 +131,28 @@ class PasswordResetConfirmSerializer(serializers.Serializer):
             raise serializers.ValidationError({"new_password_confirm": "Пароли не совпадают."})
 
         try:
-            reset_code = PasswordResetCode.objects.get(code=data['code'])
+            reset_code = PasswordResetCode.objects.select_related('user').get(code=data['code'])
         except PasswordResetCode.DoesNotExist:
             raise serializers.ValidationError({"code": "Неверный или несуществующий код."})
 
         if reset_code.is_expired():
             raise serializers.ValidationError({"code": "Срок действия кода истёк."})
 
-        user = reset_code.user
-        if check_password(data['new_password'], user.password):
+        # Сравнение с текущим хешем без setter: перехеширование старого пароля здесь не нужно
+        if check_password(data['new_password'], reset_code.user.password):
             raise serializers.ValidationError({"new_password": "Новый пароль не может совпадать с текущим."})
 
+        data['reset_code'] = reset_code
         return data
 
     def save(self):
-        code = self.validated_data['code']
-        reset_code = PasswordResetCode.objects.get(code=code)
+        reset_code = self.validated_data['reset_code']
         user = reset_code.user
         user.set_password(self.validated_data['new_password'])
-        user.save()
+        user.save(update_fields=['password'])
         reset_code.delete()
         return user
+
+
+class RevocableTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = RevocableRefreshToken
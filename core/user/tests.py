@@ -1,3 +1,166 @@
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from datetime import timedelta
 
-# Create your tests here.
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from product.models import Cart, CartItem, Category, Favorite, Order, OrderItem, Product, Size
+from .account_deletion import PURGE_STEPS
+from .models import PasswordResetCode
+from .revocation import prune_expired_tokens, revocation_store
+from .tokens import RevocableRefreshToken
+
+
+User = get_user_model()
+
+
+class UserTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='buyer@example.com', phone_number='0555000000', username='buyer', password='secret-pass'
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+
+
+class RegistrationUniquenessTests(UserTestCase):
+    def test_duplicates_are_reported_per_field_from_the_database_constraint(self):
+        payload = {
+            'email': 'buyer@example.com', 'username': 'buyer', 'phone_number': '0555000001',
+            'password': 'another-pass', 'password_confirm': 'another-pass',
+        }
+        response = self.client.post(reverse('user_register'), payload, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.data), {'email', 'username'})
+
+        payload.update(email='buyer@EXAMPLE.com', username='other')
+        response = self.client.post(reverse('user_register'), payload, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.data), {'email'})
+
+        payload.update(email='new@example.com', username='new')
+        self.assertEqual(self.client.post(reverse('user_register'), payload, format='json').status_code, 201)
+        self.assertTrue(User.objects.get(username='new').check_password('another-pass'))
+
+        self.client.force_authenticate(self.user)
+        response = self.client.patch(reverse('user_profile'), {'username': 'new'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('username', response.data)
+        self.assertEqual(self.client.patch(reverse('user_profile'), {'username': 'buyer'}).status_code, 200)
+
+
+@override_settings(PASSWORD_REHASH_IN_BACKGROUND=False)
+class PasswordHashingTests(UserTestCase):
+    def test_outdated_hash_is_upgraded_after_login(self):
+        with override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher']):
+            User.objects.filter(pk=self.user.pk).update(password=make_password('secret-pass'))
+
+        with override_settings(PASSWORD_HASHERS=[
+            'user.hashers.TunablePBKDF2PasswordHasher', 'django.contrib.auth.hashers.MD5PasswordHasher',
+        ]):
+            response = self.client.post(
+                reverse('token_obtain_pair'), {'email': self.user.email, 'password': 'secret-pass'}, format='json'
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('auth;dur=', response['Server-Timing'])
+            self.user.refresh_from_db()
+            self.assertEqual(identify_hasher(self.user.password).algorithm, 'pbkdf2_sha256')
+
+    @override_settings(PASSWORD_PBKDF2_ITERATIONS=1000)
+    def test_pbkdf2_iterations_are_configurable(self):
+        self.assertTrue(make_password('secret-pass').startswith('pbkdf2_sha256$1000$'))
+
+    def test_password_reset_confirm_uses_single_lookup(self):
+        reset_code = PasswordResetCode.objects.create(user=self.user)
+        url = reverse('password_reset_confirm')
+        payload = {'code': reset_code.code, 'new_password': 'secret-pass', 'new_password_confirm': 'secret-pass'}
+        self.assertEqual(self.client.post(url, payload, format='json').status_code, 400)
+
+        payload.update(new_password='another-pass', new_password_confirm='another-pass')
+        with self.assertNumQueries(3):
+            response = self.client.post(url, payload, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('another-pass'))
+
+
+@override_settings(TOKEN_PRUNE_INTERVAL=0)
+class TokenRevocationTests(UserTestCase):
+    def setUp(self):
+        super().setUp()
+        revocation_store.clear()
+
+    def test_revoked_refresh_token_is_rejected_from_memory(self):
+        refresh = str(RevocableRefreshToken.for_user(self.user))
+        self.assertEqual(self.client.post(reverse('token_refresh'), {'refresh': refresh}).status_code, 200)
+
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.post(reverse('logout'), {'refresh': refresh}).status_code, 205)
+
+        with self.assertNumQueries(0):
+            response = self.client.post(reverse('token_refresh'), {'refresh': refresh})
+        self.assertEqual(response.status_code, 401)
+
+    def test_expired_tokens_are_pruned(self):
+        RevocableRefreshToken.for_user(self.user).blacklist()
+        OutstandingToken.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        RevocableRefreshToken.for_user(self.user)
+
+        self.assertEqual(prune_expired_tokens(batch_size=1), 1)
+        self.assertEqual(OutstandingToken.objects.count(), 1)
+        self.assertFalse(BlacklistedToken.objects.exists())
+
+
+@override_settings(ACCOUNT_PURGE_IN_BACKGROUND=False, ACCOUNT_PURGE_BATCH_SIZE=1, TOKEN_PRUNE_INTERVAL=0)
+class AccountDeletionTests(UserTestCase):
+    def setUp(self):
+        super().setUp()
+        revocation_store.clear()
+
+    def test_account_is_deactivated_then_purged_in_batches(self):
+        category = Category.objects.create(name='Кепки')
+        products = [
+            Product.objects.create(category=category, name=f'Кепка {i}', description='Описание',
+                                   main_cover='products/main_cover/cap.jpg', price=100)
+            for i in range(2)
+        ]
+        size = Size.objects.create(name='M')
+        cart = Cart.objects.create(user=self.user)
+        for product in products:
+            CartItem.objects.create(cart=cart, product=product, size=size, quantity=1)
+            Favorite.objects.create(user=self.user, product=product)
+        order = Order.objects.create(user=self.user, total=100)
+        OrderItem.objects.create(order=order, product=products[0], size=size, quantity=1, price=100)
+        refresh = str(RevocableRefreshToken.for_user(self.user))
+
+        self.client.force_authenticate(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertEqual(self.client.delete(reverse('delete_account')).status_code, 204)
+                self.client.force_authenticate(None)
+
+                # До коммита аккаунт уже отключён, а данные ещё на месте
+                self.user.refresh_from_db()
+                self.assertFalse(self.user.is_active)
+                self.assertEqual(self.client.post(reverse('token_refresh'), {'refresh': refresh}).status_code, 401)
+                response = self.client.post(
+                    reverse('token_obtain_pair'), {'email': self.user.email, 'password': 'secret-pass'}, format='json'
+                )
+                self.assertEqual(response.status_code, 401)
+                purge_started = len(queries)
+
+        # ACCOUNT_PURGE_BATCH_SIZE=1: каждая строка — отдельная пачка, плюс пустая выборка на каждый шаг
+        batch_reads = [q for q in queries[purge_started:] if q['sql'].endswith('LIMIT 1')]
+        rows = 2 + 1 + 2 + 1 + 1 + 1 + 1  # позиции корзины, корзина, избранное, позиция заказа, заказ, токены
+        self.assertEqual(len(batch_reads), rows + len(PURGE_STEPS))
+        self.assertFalse(User.objects.filter(pk=self.user.pk).exists())
+        self.assertFalse(CartItem.objects.exists() or Favorite.objects.exists() or Order.objects.exists())
+        self.assertEqual(Product.objects.count(), 2)
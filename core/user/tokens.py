@@ -0,0 +1,19 @@
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .revocation import revocation_store
+
+
+class RevocableRefreshToken(RefreshToken):
+    """Refresh-токен, проверяющий отзыв по revocation_store вместо запроса к BlacklistedToken."""
+
+    def check_blacklist(self):
+        if revocation_store.is_revoked(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError(_("Token is blacklisted"))
+
+    def blacklist(self):
+        result = super().blacklist()
+        revocation_store.add(self.payload[api_settings.JTI_CLAIM], self.payload['exp'])
+        return result
@@ -1,3 +1,5 @@
+import time
+
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
@@ -8,7 +10,33 @@ from .serializers import (
     PasswordResetConfirmSerializer,
 )
 from rest_framework.permissions import IsAuthenticated
-from rest_framework_simplejwt.tokens import RefreshToken
+from .account_deletion import request_account_deletion
+from .tokens import RevocableRefreshToken
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.views import TokenObtainPairView
+from product.guest_cart import merge_guest_cart
+
+
+class MergingTokenObtainPairView(TokenObtainPairView):
+    """Выдача токенов, переносящая гостевую корзину (guest_cart_token или X-Guest-Cart) в корзину пользователя."""
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        started = time.perf_counter()
+        try:
+            serializer.is_valid(raise_exception=True)
+        except TokenError as e:
+            raise InvalidToken(e.args[0])
+        auth_ms = (time.perf_counter() - started) * 1000
+
+        guest_token = request.data.get('guest_cart_token') or request.headers.get('X-Guest-Cart')
+        if guest_token:
+            merge_guest_cart(guest_token, serializer.user)
+
+        response = Response(serializer.validated_data, status=status.HTTP_200_OK)
+        # Время проверки пароля и выпуска токенов — основная часть задержки входа
+        response['Server-Timing'] = f'auth;dur={auth_ms:.1f}'
+        return response
 
 
 class UserRegistrationView(APIView):
@@ -16,7 +44,7 @@ class UserRegistrationView(APIView):
         serializer = UserRegistrationSerializer(data=request.data)
         if serializer.is_valid():
             user = serializer.save()
-            refresh = RefreshToken.for_user(user)
+            refresh = RevocableRefreshToken.for_user(user)
             return Response({
                 'refresh': str(refresh),
                 'access': str(refresh.access_token),
@@ -35,7 +63,7 @@ class LogoutView(APIView):
             refresh_token = request.data.get("refresh")
             if not refresh_token:
                 return Response({"error": "Refresh token required."}, status=status.HTTP_400_BAD_REQUEST)
-            token = RefreshToken(refresh_token)
+            token = RevocableRefreshToken(refresh_token)
             token.blacklist()
             return Response({"message": "Successfully logged out."}, status=status.HTTP_205_RESET_CONTENT)
         except Exception as e:
@@ -58,6 +86,8 @@ class UserProfileView(APIView):
 
 
 class PasswordResetRequestView(APIView):
+    throttle_scope = 'password_reset'
+
     def post(self, request):
         serializer = PasswordResetRequestSerializer(data=request.data)
         if serializer.is_valid():
@@ -78,12 +108,5 @@ class DeleteAccountView(APIView):
     permission_classes = [IsAuthenticated]
 
     def delete(self, request):
-        user = request.user
-        try:
-            RefreshToken.for_user(user).blacklist()
-            user.delete()
-            return Response({"message": "Аккаунт успешно удалён."}, status=status.HTTP_204_NO_CONTENT)
-        except Exception as e:
-            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
-
-
+        request_account_deletion(request.user)
+        return Response({"message": "Аккаунт успешно удалён."}, status=status.HTTP_204_NO_CONTENT)
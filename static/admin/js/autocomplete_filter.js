@@ -0,0 +1,16 @@
+'use strict';
+{
+    const $ = django.jQuery;
+
+    $(document).on('change', '.autocomplete-filter select', function() {
+        const parameter = this.closest('.autocomplete-filter').dataset.parameter;
+        const url = new URL(window.location.href);
+        if (this.value) {
+            url.searchParams.set(parameter, this.value);
+        } else {
+            url.searchParams.delete(parameter);
+        }
+        url.searchParams.delete('p');
+        window.location.href = url.toString();
+    });
+}